@@ -1,8 +1,22 @@
 import psutil
 import time
-import subprocess
+import random
+import socket
+import select
 import os
+import json
+import hashlib
+import threading
+import types
+import collections
+import shelve
+import calendar
+import concurrent.futures
+import multiprocessing
+import queue
+import uuid
 import gspread
+import requests
 import firebase_admin
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -15,7 +29,8 @@ from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.common.action_chains import ActionChains
 from firebase_admin import credentials, db
 from oauth2client.service_account import ServiceAccountCredentials
-from datetime import datetime
+from google.auth.transport.requests import Request as GoogleAuthRequest
+from datetime import datetime, timedelta
 
 # ==================== CONFIGURABLE SETTINGS ====================
 # Base directories - Auto-detected
@@ -30,10 +45,55 @@ REPORT_NUMBER_FILE = os.path.join(WHATSAPP_BOT_DIR, "venv", "report number")
 CONTACT_FILE = os.path.join(WHATSAPP_BOT_DIR, "Today birthday list contact")
 WISHES_FILE = os.path.join(WHATSAPP_BOT_DIR, "Wishes")
 WHATSAPP_REPORT_FILE = os.path.join(WHATSAPP_BOT_DIR, "WhatsApp report")
+XPATH_CACHE_FILE = os.path.join(WHATSAPP_BOT_DIR, "Xpath cache.json")
+BIRTHDAY_INDEX_FILE = os.path.join(WHATSAPP_BOT_DIR, "Birthday index")
+RUN_JOURNAL_FILE = os.path.join(WHATSAPP_BOT_DIR, "Run journal")
+SPREADSHEET_ID_CACHE_FILE = os.path.join(WHATSAPP_BOT_DIR, "Spreadsheet id.json")
 
 # Browser settings
 CHROMEDRIVER_PATH = "/usr/bin/chromedriver"
 CHROME_PROFILE_PATH = os.path.join(USER_HOME, ".config", "chromium") 
+CHROME_HEADLESS = False  # True = run Chromium with --headless=new (log in once with a visible browser first)
+CHROME_RENDERER_PROCESS_LIMIT = 2  # Renderer processes Chromium may keep alive (lower = less memory)
+CHROME_EXTRA_ARGUMENTS = []  # Extra Chromium switches appended to the shared launch profile
+CONCURRENT_STARTUP = True  # Open WhatsApp Web on a background thread while the spreadsheet steps (5-15) run
+BROWSER_WARMUP_TIMEOUT = 120  # Seconds the background launch waits for the chat list (QR login included)
+KEEP_BROWSER_OPEN = True  # Reuse one WhatsApp Web session for all contacts instead of relaunching per wish
+DELIVERY_TIMEOUT = 120  # Seconds to wait for the pending clock icon (Xpath003) to clear
+DELIVERY_APPEAR_GRACE = 3  # Fallback: seconds without clock icon or tick after which the message counts as sent
+READINESS_MIN_TIMEOUT = 2  # Lower bound (seconds) of the adaptive timeout of a readiness wait
+READINESS_MAX_TIMEOUT = 20  # Upper bound (seconds) of the adaptive timeout of a readiness wait
+SEARCH_RESULT_WAIT = 10  # Seconds to wait for a search result matching the typed number (the old fixed sleep)
+# Defaults of WhatsApp/Xpath/Xpath005-007, used until they are set in the database
+SEARCH_RESULT_XPATH = "//div[@id='pane-side']//div[@role='listitem' or @role='row']"  # Xpath005
+MESSAGE_FIELD_XPATH = "//div[@contenteditable='true'][@data-tab='10']"  # Xpath006
+SEND_BUTTON_XPATH = "//button[@aria-label='Send'] | //span[@data-icon='send']"  # Xpath007
+CHAT_LIST_XPATH = "//div[@aria-label='Chat list']"
+CHAT_OPEN_MODE = "search"  # "search" types the number into the chat search, "deeplink" opens web.whatsapp.com/send?phone=
+CHAT_LINK_TIMEOUT = 60  # Seconds a send?phone= page load may take (fixed - a reload on a Pi can be slow)
+INVALID_PHONE_XPATH = "//*[contains(text(), 'Phone number shared via url is invalid')]"  # Xpath008 default
+# Sent/delivered tick of the newest outgoing message, Xpath009 default
+SENT_TICK_XPATH = ("(//div[contains(@class, 'message-out')])[last()]"
+                   "//span[@data-icon='msg-check' or @data-icon='msg-dblcheck']")
+# Connectivity probe: TCP connects to these endpoints (no ping process), result cached for CONNECTIVITY_TTL s.
+# IP addresses only - the probe never waits on a DNS lookup
+CONNECTIVITY_ENDPOINTS = [("8.8.8.8", 53), ("1.1.1.1", 53), ("8.8.4.4", 53)]
+CONNECTIVITY_TTL = 5
+CONNECTIVITY_PROBE_TIMEOUT = 2
+# Retry policy per endpoint: exponential backoff (base_delay doubling up to max_delay, with jitter);
+# after breaker_failures failures in a row the circuit opens and callers wait breaker_cooldown seconds
+RETRY_POLICIES = {
+    "sheets": {"base_delay": 1, "max_delay": 60, "breaker_failures": 5, "breaker_cooldown": 120},
+    "firebase": {"base_delay": 1, "max_delay": 30, "breaker_failures": 5, "breaker_cooldown": 60},
+}
+# Attempts before a step gives up (steps not listed retry forever). The contact is then retried after the others.
+RETRY_STEP_BUDGETS = {"step23": 8, "step26": 8}
+# "Sent message" rows are uploaded in the background every UPLOAD_BATCH_SIZE contacts or UPLOAD_BATCH_SECONDS
+UPLOAD_BATCH_SIZE = 10
+UPLOAD_BATCH_SECONDS = 30
+# Worker pool: list 2 or more Chromium profiles, each logged in to its own WhatsApp number,
+# to send wishes in parallel (one browser per profile). Empty list = single browser.
+WORKER_PROFILE_PATHS = []
 
 # Application settings
 SPREADSHEET_NAME = "WhatsApp birthday wisher"
@@ -49,144 +109,1427 @@ driver = None
 next_step = None
 step8_message = None
 extracted_phone_number = None
-skip_to_step31 = False
-selected_wish_stored = None
+workflow_state = {}  # Values handed from one step-graph node to a later one (spreadsheet, timestamp, wish, ...)
+step_timings = collections.defaultdict(list)  # Step-graph node -> measured durations in seconds
+worker_name = None
+xpath_registry = {}  # In-process copy of every XpathNNN key under WhatsApp/Xpath
+xpath_registry_etag = None  # Firebase ETag of the data held in xpath_registry
+xpath_registry_lock = threading.Lock()
+xpath_listener = None
+birthday_snapshot = None  # Immutable in-memory copy of the "Birthday list" worksheet
+readiness_timings = {}  # Readiness wait name -> measured durations in seconds
+delivery_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)  # Runs the in-page delivery watcher
+startup_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)  # Runs the background browser warm-up
+browser_warmup = {}  # "future": readiness future of the browser being opened in the background
+startup_io_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)  # Runs the startup reads side by side
+startup_fetches = {}  # Startup read name -> its future (see STARTUP FAN-OUT)
+contact_store = None  # In-memory index of the contact file (see CONTACT STORE)
+next_contact = {}  # "id", "phone" and "wish" prepared for the next contact while a send is confirming
+connectivity = {"online": None, "checked": 0.0}  # Last probe result and its monotonic time
+online_event = threading.Event()  # Set while online - wait on it for "back online"
+connectivity_lock = threading.Lock()
+connectivity_monitor = None
+sheets_client = None  # One authorized gspread client per process (see SHEETS CONNECTION)
+sheets_spreadsheet = None
+sheets_lock = threading.Lock()
+sheets_token_refresher = None
+process_token = uuid.uuid4().hex  # Tells this process's journal records from those of an earlier crashed one
+upload_queue = queue.Queue(maxsize=200)  # Finished contacts waiting for the background uploader
+uploader_thread = None
+uploader_state = {"uploaded": set(), "uncertain": False}  # Contact ids uploaded by this process
+sent_message_worksheet = None
+wishes_store = None  # In-memory copy of the Wishes file (see WISHES STORE)
+wishes_sheet_modified = None  # Spreadsheet revision checked by step13, saved with the downloaded wishes
+retry_state = {}  # Endpoint -> {"failures", "open_until"}; step name -> attempts in a row
+retry_lock = threading.Lock()
+birthday_index_current = False  # True when the local birthday index matches the sheet (no download needed)
+sheet_revision = {"known": None}  # Spreadsheet revision the local caches were last checked against
+sheet_revision_lock = threading.Lock()
+
+# Column name variants accepted for each field of the "Birthday list" worksheet
+DOB_COLUMNS = ('Date of Birth', 'Date of birth', 'DOB', 'dob')
+COUNTRY_CODE_COLUMNS = ('Country Code', 'country code', 'Country code', 'Counrty Code')
+WHATSAPP_NUMBER_COLUMNS = ('WhatsApp Number', 'Whatsapp Number', 'whatsapp number', 'Phone')
+NAME_COLUMNS = ('Name', 'name')
+
+BirthdaySnapshot = collections.namedtuple("BirthdaySnapshot", ["header", "columns", "rows", "by_day_month"])
+
+# ==================== BROWSER LIFECYCLE ====================
+# Only the browser this process started is closed: the process tree under its chromedriver,
+# or, when no driver is open, Chromium left on our own profile by an earlier (crashed) run.
+BROWSER_QUIT_TIMEOUT = 5
+
+def driver_process_tree(web_driver):
+    """The chromedriver started for web_driver and every process under it (Chromium, renderers, ...)."""
+    try:
+        root = psutil.Process(web_driver.service.process.pid)
+        return [root] + root.children(recursive=True)
+    except (AttributeError, psutil.Error):
+        return []
+
+def profile_processes(profile_path):
+    """Processes running on a Chromium profile (with their children and chromedriver parents)."""
+    marker = f"--user-data-dir={profile_path}"
+    found = {}
+    for proc in psutil.process_iter(['cmdline']):
+        try:
+            if marker not in (proc.info['cmdline'] or []):
+                continue
+            for member in [proc] + proc.children(recursive=True):
+                found[member.pid] = member
+            parent = proc.parent()
+            if parent is not None and "chromedriver" in parent.name():
+                found[parent.pid] = parent
+        except psutil.Error:
+            continue
+    return list(found.values())
+
+def stop_processes(processes, graceful=True):
+    """Waits up to BROWSER_QUIT_TIMEOUT for processes to exit (terminating them unless already asked),
+    then kills what is left. Returns as soon as all of them are gone."""
+    if graceful:
+        for proc in processes:
+            try:
+                proc.terminate()
+            except psutil.Error:
+                pass
+    _, alive = psutil.wait_procs(processes, timeout=BROWSER_QUIT_TIMEOUT)
+    for proc in alive:
+        try:
+            proc.kill()
+            print(f"Killed process: {proc.pid}")
+        except psutil.Error:
+            pass
+    psutil.wait_procs(alive, timeout=BROWSER_QUIT_TIMEOUT)
+
+# Lean launch profile for low-memory hosts: no extensions, background networking, GPU, sync or
+# component updates, and a capped number of renderer processes.
+CHROME_LEAN_ARGUMENTS = [
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-gpu",
+    "--disable-sync",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--no-first-run",
+    "--mute-audio",
+]
+browser_launch = {}  # "started": monotonic time of the launch still waiting for the chat list
+browser_launch_timings = []  # Launch-to-chat-list-ready seconds, one entry per launch
+
+def chrome_launch_options():
+    """The shared Chromium launch profile used by every step that opens WhatsApp Web."""
+    chrome_options = Options()
+    for argument in CHROME_LEAN_ARGUMENTS + list(CHROME_EXTRA_ARGUMENTS):
+        chrome_options.add_argument(argument)
+    chrome_options.add_argument(f"--renderer-process-limit={CHROME_RENDERER_PROCESS_LIMIT}")
+    if CHROME_HEADLESS:
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--window-size=1366,768")
+    else:
+        chrome_options.add_argument("--start-maximized")
+    chrome_options.add_argument(f"--user-data-dir={CHROME_PROFILE_PATH}")
+    return chrome_options
+
+def launch_whatsapp_web():
+    """Starts Chromium with the shared launch profile and opens WhatsApp Web. Returns the driver."""
+    global driver
+    browser_launch["started"] = time.monotonic()
+    service = Service(executable_path=CHROMEDRIVER_PATH)
+    driver = webdriver.Chrome(service=service, options=chrome_launch_options())
+    if CHROME_HEADLESS:
+        # WhatsApp Web refuses the "HeadlessChrome" user agent
+        user_agent = driver.execute_script("return navigator.userAgent").replace("HeadlessChrome", "Chrome")
+        driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": user_agent})
+    driver.get("https://web.whatsapp.com/")
+    return driver
+
+def record_launch_ready():
+    """Records the launch-to-chat-list-ready time of the current browser launch (first call only)."""
+    started = browser_launch.pop("started", None)
+    if started is None:
+        return
+    elapsed = time.monotonic() - started
+    browser_launch_timings.append(elapsed)
+    print(f"WhatsApp Web chat list ready {elapsed:.1f}s after browser launch")
+# ==================== END BROWSER LIFECYCLE ====================
 
 def close_chrome():
-    """Closes all running instances of Chrome, Chromium, and chromedriver."""
+    """Closes the Chromium browser and chromedriver started by this process (bounded wait, no fixed sleep)."""
     global driver
+    # Never close a browser while the warm-up thread is still launching it
+    pending_warmup = browser_warmup.pop("future", None)
+    if pending_warmup is not None:
+        concurrent.futures.wait([pending_warmup])
     try:
         if driver:
-            driver.quit()
+            processes = driver_process_tree(driver)
+            try:
+                driver.quit()  # Asks chromedriver to close Chromium gracefully
+            except Exception as e:
+                print(f"Error quitting browser: {str(e)}")
             driver = None
+            # quit() already asked them to exit - only wait, then kill our own leftovers
+            stop_processes(processes, graceful=False)
+            print("Closed Chrome/Chromium browser.")
+            return
         
-        for proc in psutil.process_iter(['name']):
-            if proc.info['name'] in ['chrome', 'chromium', 'chromedriver']:
-                try:
-                    proc.kill()
-                    print(f"Killed process: {proc.info['name']}")
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-        
-        print("Closed all Chrome/Chromium instances.")
-        time.sleep(2)
+        # No driver in this process: clear Chromium an earlier run left on our profile (it locks the profile)
+        leftovers = profile_processes(CHROME_PROFILE_PATH)
+        if leftovers:
+            stop_processes(leftovers)
+            print(f"Closed {len(leftovers)} leftover Chrome/Chromium processes on our profile.")
+        else:
+            print("No Chrome/Chromium instance open on our profile.")
     except Exception as e:
         print(f"Error closing Chrome: {str(e)}")
 
-def check_internet():
-    """Checks for an active internet connection."""
+# ==================== CONNECTIVITY MONITOR ====================
+def probe_connectivity():
+    """Starts non-blocking TCP connects to every endpoint; online as soon as one completes."""
+    sockets = []
     try:
-        subprocess.check_call(["ping", "-c", "1", "8.8.8.8"],
-                            stdout=subprocess.DEVNULL,
-                            stderr=subprocess.DEVNULL)
-        return True
-    except subprocess.CalledProcessError:
+        for host, port in CONNECTIVITY_ENDPOINTS:
+            try:
+                # AI_NUMERICHOST: never a (blocking) DNS lookup, host names are skipped
+                address = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM,
+                                             0, socket.AI_NUMERICHOST)[0][4]
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                sock.connect_ex(address)
+                sockets.append(sock)
+            except OSError:
+                continue  # Not an IP address or no route - try the other endpoints
+        
+        deadline = time.monotonic() + CONNECTIVITY_PROBE_TIMEOUT
+        while sockets:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _, writable, _ = select.select([], sockets, [], remaining)
+            for sock in writable:
+                if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    return True
+                sockets.remove(sock)  # Refused or unreachable
         return False
+    finally:
+        for sock in sockets:
+            sock.close()
+
+def record_connectivity(online):
+    """Caches a probe result and sets or clears online_event."""
+    with connectivity_lock:
+        connectivity["online"] = online
+        connectivity["checked"] = time.monotonic()
+    if online:
+        online_event.set()
+    else:
+        online_event.clear()
+    return online
+
+def connectivity_monitor_loop():
+    """Background probe: every CONNECTIVITY_TTL s while online, every second while offline."""
+    while True:
+        online = record_connectivity(probe_connectivity())
+        time.sleep(CONNECTIVITY_TTL if online else 1)
+
+def start_connectivity_monitor():
+    """Starts the background probe once per process (again after a fork, where threads are not copied)."""
+    global connectivity_monitor
+    if connectivity_monitor is not None and connectivity_monitor.is_alive():
+        return
+    connectivity_monitor = threading.Thread(target=connectivity_monitor_loop, name="connectivity", daemon=True)
+    connectivity_monitor.start()
+
+def is_online(max_age=None):
+    """Cached connectivity; probes inline only when the last result is older than CONNECTIVITY_TTL."""
+    start_connectivity_monitor()
+    max_age = CONNECTIVITY_TTL if max_age is None else max_age
+    with connectivity_lock:
+        online, checked = connectivity["online"], connectivity["checked"]
+    if online is None or time.monotonic() - checked > max_age:
+        online = record_connectivity(probe_connectivity())
+    return online
+# ==================== END CONNECTIVITY MONITOR ====================
+
+def check_internet():
+    """Checks for an active internet connection (cached, see CONNECTIVITY MONITOR)."""
+    return is_online()
         
 def wait_for_internet():
-    """Waits for internet connection with countdown (retries forever)."""
+    """Waits for internet connection with countdown (retries forever, wakes as soon as it is back)."""
     count = 1
     while True:
         if check_internet():
             print("Internet is restored good to go")
             break
         print(f"Internet is not present retry second(s) {count}...")
-        time.sleep(1)
+        online_event.wait(1)
         count += 1
 
+# ==================== RETRY POLICY ====================
+def retry_pause(endpoint, step_name):
+    """Called after a failed attempt: waits out the backoff (or the open circuit) for the endpoint.
+    
+    Returns False when the step has used up its RETRY_STEP_BUDGETS attempts (the caller gives up).
+    """
+    if not check_internet():
+        # Offline is not the endpoint's fault - no backoff, just wait for the connection
+        wait_for_internet()
+        return True
+    
+    policy = RETRY_POLICIES[endpoint]
+    with retry_lock:
+        state = retry_state.setdefault(endpoint, {"failures": 0, "open_until": 0.0})
+        state["failures"] += 1
+        attempts = retry_state[step_name] = retry_state.get(step_name, 0) + 1
+        budget = RETRY_STEP_BUDGETS.get(step_name)
+        if budget is not None and attempts >= budget:
+            retry_state[step_name] = 0
+            print(f"{step_name} failed {attempts} times - giving up")
+            return False
+        
+        now = time.monotonic()
+        if state["failures"] >= policy["breaker_failures"] and state["open_until"] <= now:
+            state["open_until"] = now + policy["breaker_cooldown"]
+            print(f"Too many {endpoint} errors - pausing {endpoint} calls for {policy['breaker_cooldown']} seconds")
+        delay = min(policy["max_delay"], policy["base_delay"] * 2 ** (state["failures"] - 1))
+        delay = delay / 2 + random.uniform(0, delay / 2)  # Jitter so retries do not arrive together
+        delay = max(delay, state["open_until"] - now)
+    
+    print(f"Retrying in {delay:.1f} seconds...")
+    time.sleep(delay)
+    return True
+
+def wait_for_endpoint(endpoint):
+    """Called before a call to the endpoint: waits while its circuit is open."""
+    with retry_lock:
+        remaining = retry_state.get(endpoint, {}).get("open_until", 0.0) - time.monotonic()
+    if remaining > 0:
+        print(f"{endpoint} calls are paused - waiting {remaining:.1f} seconds")
+        time.sleep(remaining)
+
+def retry_succeeded(endpoint, step_name):
+    """Resets the backoff, circuit and step budget after a successful call."""
+    with retry_lock:
+        retry_state[endpoint] = {"failures": 0, "open_until": 0.0}
+        retry_state[step_name] = 0
+# ==================== END RETRY POLICY ====================
+
 def check_file_exists(file_path):
     """Checks if a file exists."""
     return os.path.isfile(file_path)
 
-def initialize_spreadsheet():
-    """Initializes connection to Google Spreadsheet (retries forever)."""
+# ==================== SHEETS CONNECTION ====================
+# The service account is authorized once per process. All sheet steps share the client, its
+# pooled HTTP session and the spreadsheet, opened by key (the name is resolved once, cached on disk).
+SHEETS_SCOPE = ["https://spreadsheets.google.com/feeds",
+                "https://www.googleapis.com/auth/drive"]
+SHEETS_POOL_SIZE = 8
+SHEETS_TOKEN_CHECK_INTERVAL = 60
+
+def sheets_http(client):
+    """The part of a gspread client holding the auth and session (http_client from gspread 6)."""
+    return getattr(client, "http_client", client)
+
+def sheets_token_refresher_loop():
+    """Background thread: refreshes the access token before it expires, so no sheet call waits for it."""
     while True:
+        time.sleep(SHEETS_TOKEN_CHECK_INTERVAL)
         try:
-            scope = ["https://spreadsheets.google.com/feeds", 
-                    "https://www.googleapis.com/auth/drive"]
-            creds = ServiceAccountCredentials.from_json_keyfile_name(SPREADSHEET_KEY, scope)
+            auth = sheets_http(sheets_client).auth
+            expiry = getattr(auth, "expiry", None)
+            if expiry is None or expiry - datetime.utcnow() < timedelta(minutes=5):
+                auth.refresh(GoogleAuthRequest())
+        except Exception as e:
+            print(f"Error refreshing Google access token: {str(e)}")
+
+def get_sheets_client():
+    """Authorizes the service account on first use and returns the shared gspread client."""
+    global sheets_client, sheets_token_refresher
+    with sheets_lock:
+        if sheets_client is None:
+            creds = ServiceAccountCredentials.from_json_keyfile_name(SPREADSHEET_KEY, SHEETS_SCOPE)
             client = gspread.authorize(creds)
-            spreadsheet = client.open(SPREADSHEET_NAME)
+            # Keep-alive connections for every sheet step and background thread
+            adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=SHEETS_POOL_SIZE)
+            sheets_http(client).session.mount("https://", adapter)
+            sheets_client = client
+        if sheets_token_refresher is None or not sheets_token_refresher.is_alive():
+            sheets_token_refresher = threading.Thread(target=sheets_token_refresher_loop, name="sheets-token", daemon=True)
+            sheets_token_refresher.start()
+    return sheets_client
+
+def load_spreadsheet_id():
+    """Spreadsheet id cached for SPREADSHEET_NAME (None when not resolved yet)."""
+    try:
+        with open(SPREADSHEET_ID_CACHE_FILE, 'r') as file:
+            cached = json.load(file)
+        return cached["id"] if cached.get("name") == SPREADSHEET_NAME else None
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save_spreadsheet_id(spreadsheet_id):
+    """Caches the spreadsheet id so later runs skip the Drive name search."""
+    try:
+        write_file_atomically(SPREADSHEET_ID_CACHE_FILE, [json.dumps({"name": SPREADSHEET_NAME, "id": spreadsheet_id})])
+    except OSError as e:
+        print(f"Error writing spreadsheet id cache: {str(e)}")
+
+def open_shared_spreadsheet():
+    """Returns the shared Spreadsheet, opened by its cached key (by name only the first time)."""
+    global sheets_spreadsheet
+    if sheets_spreadsheet is not None:
+        return sheets_spreadsheet
+    
+    client = get_sheets_client()
+    spreadsheet = None
+    spreadsheet_id = load_spreadsheet_id()
+    if spreadsheet_id:
+        try:
+            spreadsheet = client.open_by_key(spreadsheet_id)
+        except gspread.exceptions.SpreadsheetNotFound:
+            print("Cached spreadsheet id not found - resolving the spreadsheet name again")
+        except gspread.exceptions.APIError as e:
+            if getattr(e.response, "status_code", None) != 404:
+                raise
+            print("Cached spreadsheet id not found - resolving the spreadsheet name again")
+    
+    if spreadsheet is None:
+        spreadsheet = client.open(SPREADSHEET_NAME)  # Drive search by name
+        save_spreadsheet_id(spreadsheet.id)
+    
+    sheets_spreadsheet = spreadsheet
+    return spreadsheet
+# ==================== END SHEETS CONNECTION ====================
+
+def initialize_spreadsheet():
+    """Initializes connection to Google Spreadsheet (retries forever, shared by all sheet steps)."""
+    while True:
+        try:
+            wait_for_endpoint("sheets")
+            spreadsheet = open_shared_spreadsheet()
+            retry_succeeded("sheets", "step5")
             return spreadsheet
         except Exception as e:
             print(f"Error initializing spreadsheet: {str(e)}")
-            print("Retrying in 5 seconds...")
-            time.sleep(5)
+            retry_pause("sheets", "step5")
 
 def initialize_firebase():
     """Initializes Firebase connection (retries forever)."""
     while True:
         try:
+            wait_for_endpoint("firebase")
             if not firebase_admin._apps:
                 cred = credentials.Certificate(DATABASE_KEY)
                 firebase_admin.initialize_app(cred, {
                     "databaseURL": FIREBASE_DB_URL
                 })
+            retry_succeeded("firebase", "firebase")
             print("Firebase initialized successfully")
             return True
         except Exception as e:
             print(f"Firebase initialization failed: {str(e)}")
-            print("Retrying in 5 seconds...")
-            time.sleep(5)
+            retry_pause("firebase", "firebase")
+
+# ==================== XPATH REGISTRY ====================
+def load_xpath_cache():
+    """Loads XPaths saved by a previous run so the bot can start without network."""
+    global xpath_registry, xpath_registry_etag
+    try:
+        with open(XPATH_CACHE_FILE, 'r') as file:
+            cache = json.load(file)
+        xpaths = cache.get("xpaths") or {}
+        # Ignore a cache whose content does not match its own checksum (partial write)
+        if cache.get("checksum") != xpath_checksum(xpaths):
+            print("XPath cache is corrupt - ignoring it")
+            return False
+        with xpath_registry_lock:
+            xpath_registry = dict(xpaths)
+            xpath_registry_etag = cache.get("etag")
+        print(f"Loaded {len(xpaths)} XPaths from local cache")
+        return bool(xpaths)
+    except FileNotFoundError:
+        print("XPath cache not found")
+        return False
+    except Exception as e:
+        print(f"Error reading XPath cache: {str(e)}")
+        return False
+
+def xpath_checksum(xpaths):
+    """Returns a stable content hash of an XPath mapping."""
+    return hashlib.sha1(json.dumps(xpaths, sort_keys=True).encode("utf-8")).hexdigest()
+
+def save_xpath_cache():
+    """Writes the registry to disk (write-then-rename, so a crash never leaves half a file)."""
+    with xpath_registry_lock:
+        xpaths = dict(xpath_registry)
+        etag = xpath_registry_etag
+    try:
+        cache = {"etag": etag, "checksum": xpath_checksum(xpaths), "xpaths": xpaths}
+        write_file_atomically(XPATH_CACHE_FILE, [json.dumps(cache)])
+    except Exception as e:
+        print(f"Error writing XPath cache: {str(e)}")
+
+def set_xpath_registry(xpath_data, etag):
+    """Replaces the registry with the XpathNNN keys of a WhatsApp/Xpath snapshot."""
+    global xpath_registry, xpath_registry_etag
+    xpaths = {key: value for key, value in (xpath_data or {}).items()
+              if key.startswith("Xpath") and isinstance(value, str)}
+    with xpath_registry_lock:
+        changed = xpaths != xpath_registry
+        xpath_registry = xpaths
+        xpath_registry_etag = etag
+    save_xpath_cache()
+    return changed
+
+def refresh_xpath_registry():
+    """Refreshes the registry from Firebase, downloading data only if its ETag changed."""
+    if not initialize_firebase():
+        raise Exception("Failed to initialize Firebase")
+    
+    whatsapp_ref = db.reference("WhatsApp/Xpath")
+    if xpath_registry_etag:
+        changed, xpath_data, etag = whatsapp_ref.get_if_changed(xpath_registry_etag)
+        if not changed:
+            return False
+    else:
+        xpath_data, etag = whatsapp_ref.get(etag=True)
+    
+    if set_xpath_registry(xpath_data, etag):
+        print("XPath registry updated from database")
+        return True
+    return False
+
+def on_xpath_change(event):
+    """Firebase listener callback: applies pushed XPath changes to the registry.
+    
+    A "put" replaces the data at event.path, a "patch" only updates the children it lists.
+    """
+    try:
+        key = event.path.strip("/").split("/")[0]
+        if event.event_type == "put" and not key:
+            # Full snapshot (sent once when the listener connects, or the whole node was replaced)
+            xpath_data = event.data or {}
+        else:
+            with xpath_registry_lock:
+                xpath_data = dict(xpath_registry)
+            changes = {key: event.data} if key else (event.data or {})
+            for name, value in changes.items():
+                if value is None:
+                    xpath_data.pop(name, None)
+                else:
+                    xpath_data[name] = value
+        # Pushed data carries no ETag - clear it so the next refresh does a full read
+        if set_xpath_registry(xpath_data, None):
+            print("XPath registry updated by database listener")
+    except Exception as e:
+        print(f"Error applying XPath change: {str(e)}")
+
+def start_xpath_listener():
+    """Subscribes to WhatsApp/Xpath changes (runs in the background, never blocks the bot)."""
+    def listen():
+        global xpath_listener
+        try:
+            if initialize_firebase():
+                xpath_listener = db.reference("WhatsApp/Xpath").listen(on_xpath_change)
+        except Exception as e:
+            print(f"XPath listener unavailable, using cached XPaths: {str(e)}")
+    
+    if xpath_listener is None:
+        threading.Thread(target=listen, daemon=True).start()
+
+def load_xpath_registry():
+    """Loads all XPaths once at startup: local cache first, then Firebase if there is no cache."""
+    if not os.path.isfile(DATABASE_KEY):
+        # Missing key is reported by the database key check steps
+        load_xpath_cache()
+        return True
+    if not load_xpath_cache():
+        try:
+            refresh_xpath_registry()
+            print(f"Loaded {len(xpath_registry)} XPaths from database")
+        except Exception as e:
+            print(f"Error loading XPaths from database: {str(e)}")
+    start_xpath_listener()
+    return True
+
+def get_xpath(key, step_name):
+    """Returns an XPath from the registry, fetching from Firebase only when it is missing.
+    
+    Retries with the firebase backoff; returns None only when the step has a RETRY_STEP_BUDGETS entry.
+    """
+    while True:
+        with xpath_registry_lock:
+            value = xpath_registry.get(key)
+        if value:
+            return value
+        try:
+            wait_for_endpoint("firebase")
+            refresh_xpath_registry()
+            if key not in xpath_registry:
+                raise Exception(f"{key} not found in database")
+            retry_succeeded("firebase", step_name)
+        except Exception as e:
+            print(f"Error fetching WhatsApp {key}: {str(e)}")
+            print(f"Retrying {step_name}...")
+            if not retry_pause("firebase", step_name):
+                return None
+
+def refresh_xpath_after_lookup_failure(key):
+    """Called when an element could not be found: re-checks Firebase for a newer XPath."""
+    try:
+        if refresh_xpath_registry():
+            print(f"WhatsApp {key} refreshed after failed lookup")
+    except Exception as e:
+        print(f"Error refreshing WhatsApp {key}: {str(e)}")
+    with xpath_registry_lock:
+        return xpath_registry.get(key)
+
+def registry_xpath(key, default):
+    """XPath `key` from the registry, or default while the database does not have it yet."""
+    with xpath_registry_lock:
+        return xpath_registry.get(key) or default
+# ==================== END XPATH REGISTRY ====================
+
+# ==================== READINESS WAITS ====================
+# Condition based waits replacing fixed "stability" sleeps. Each wait returns as soon as
+# its DOM condition holds, with a timeout adapted to how long the same wait took before.
+# A timeout is not a measurement: it resets the wait to its default timeout.
+DOM_QUIET_SCRIPT = """
+if (!window.__wbwMutationWatch) {
+    window.__wbwLastMutation = Date.now();
+    window.__wbwMutationWatch = new MutationObserver(() => { window.__wbwLastMutation = Date.now(); });
+    window.__wbwMutationWatch.observe(document.body, {childList: true, subtree: true, characterData: true});
+}
+return Date.now() - window.__wbwLastMutation;
+"""
+
+# True when a search result row shows the number typed into the search field (digits only)
+SEARCH_MATCH_SCRIPT = """
+const first = (xpath) => document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const field = first("//div[@contenteditable='true']");
+const query = field ? field.textContent.replace(/\\D/g, '') : '';
+if (!query) return false;
+const rows = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+for (let i = 0; i < rows.snapshotLength; i++) {
+    if (rows.snapshotItem(i).textContent.replace(/\\D/g, '').includes(query)) return true;
+}
+// Saved contacts show a name, not the number: accept a result list that was replaced since the
+// number was typed (first row and row count both changed - a reordered chat list keeps its count)
+const before = window.__wbwSearchBefore;
+if (!before || !rows.snapshotLength) return false;
+return rows.snapshotItem(0).textContent !== before.first && rows.snapshotLength !== before.count;
+"""
+
+# Remembers the chat list shown before a number is typed into the search field
+SEARCH_MARK_SCRIPT = """
+const rows = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+window.__wbwSearchBefore = {first: rows.snapshotLength ? rows.snapshotItem(0).textContent : '', count: rows.snapshotLength};
+"""
+
+# True when the compose box (found by its XPath) has keyboard focus
+COMPOSE_FOCUS_SCRIPT = """
+const box = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+return !!box && (document.activeElement === box || box.contains(document.activeElement));
+"""
+
+def adaptive_timeout(name, default_timeout):
+    """Returns 3x the slowest of the last 10 successful waits of this kind, within the configured bounds."""
+    history = readiness_timings.get(name)
+    if not history:
+        return default_timeout
+    return min(READINESS_MAX_TIMEOUT, max(READINESS_MIN_TIMEOUT, 3 * max(history[-10:])))
+
+def wait_until_ready(name, condition, default_timeout=10, adaptive=True):
+    """Waits until condition(driver) holds and records how long it took. Returns None on timeout.
+    
+    With adaptive=False the wait always uses default_timeout.
+    """
+    timeout = adaptive_timeout(name, default_timeout) if adaptive else default_timeout
+    start_time = time.time()
+    try:
+        result = WebDriverWait(driver, timeout, poll_frequency=0.1).until(condition)
+        elapsed = time.time() - start_time
+        readiness_timings.setdefault(name, []).append(elapsed)
+        print(f"{name} ready after {elapsed:.2f}s")
+        return result
+    except Exception:
+        # Forget the history: the next wait uses the default timeout instead of a growing one
+        readiness_timings.pop(name, None)
+        print(f"{name} not ready after {timeout:.1f}s - continuing")
+        return None
+
+def dom_quiet(quiet_ms=300):
+    """Condition: the page has not changed for quiet_ms milliseconds."""
+    return lambda d: d.execute_script(DOM_QUIET_SCRIPT) >= quiet_ms
+
+def mark_search_list():
+    """Call right before typing a number into the search field: remembers the settled chat list, so
+    search_results_rendered() can tell the search results from it."""
+    try:
+        wait_until_ready("Chat list settled", dom_quiet(), default_timeout=2)
+        driver.execute_script(SEARCH_MARK_SCRIPT, registry_xpath("Xpath005", SEARCH_RESULT_XPATH))
+    except Exception as e:
+        print(f"Could not mark chat list before search: {str(e)}")
+
+def search_results_rendered():
+    """Condition: the search for the typed number finished - the "no chats" message (Xpath004), a
+    result row showing that number, or a result list that replaced the chat list marked before
+    typing is rendered and the page settled. Rows of the unfiltered chat list do not count."""
+    def condition(d):
+        no_results_xpath = xpath_registry.get("Xpath004")
+        no_results = no_results_xpath and d.find_elements(By.XPATH, no_results_xpath)
+        if not no_results and not d.execute_script(SEARCH_MATCH_SCRIPT, registry_xpath("Xpath005", SEARCH_RESULT_XPATH)):
+            return False
+        return dom_quiet()(d)
+    return condition
+
+def compact_text(text):
+    """Removes all whitespace, so rendered line breaks and spacing do not affect comparisons."""
+    return "".join(text.split())
+
+def field_text_matches(element, expected_text):
+    """Condition: an input field shows expected_text (whitespace ignored); "" waits for an empty field."""
+    expected = compact_text(expected_text)
+    
+    def condition(d):
+        entered = compact_text(element.text)
+        return entered == "" if not expected else expected in entered
+    return condition
+
+def compose_box_focused():
+    """Condition: the message compose box has keyboard focus."""
+    return lambda d: d.execute_script(COMPOSE_FOCUS_SCRIPT, registry_xpath("Xpath006", MESSAGE_FIELD_XPATH))
+
+def search_result_focused():
+    """Condition: keyboard focus moved from the search field into the result list."""
+    return lambda d: d.execute_script(
+        "const el = document.activeElement;"
+        "return !!el && el.getAttribute('contenteditable') !== 'true';")
+
+def previous_chat_closed():
+    """Condition: no chat is open - the compose box (Xpath002) of the previous contact is gone."""
+    def condition(d):
+        compose_xpath = registry_xpath("Xpath002", None)
+        return not compose_xpath or not d.find_elements(By.XPATH, compose_xpath)
+    return condition
+
+def send_button_enabled():
+    """Condition: the send button is rendered and enabled."""
+    def condition(d):
+        buttons = d.find_elements(By.XPATH, registry_xpath("Xpath007", SEND_BUTTON_XPATH))
+        return any(button.is_enabled() for button in buttons)
+    return condition
+
+def press_down_and_enter(wait_for_results=True):
+    """Opens the first search result once the results are rendered (Down arrow, then Enter).
+    
+    wait_for_results=False when step 22 already waited for the results of this search.
+    """
+    if wait_for_results:
+        wait_until_ready("Search results", search_results_rendered(), default_timeout=SEARCH_RESULT_WAIT, adaptive=False)
+    
+    # Press down arrow key using ActionChains
+    actions = ActionChains(driver)
+    actions.send_keys(Keys.ARROW_DOWN)
+    actions.perform()
+    print("Down arrow key pressed successfully")
+    
+    wait_until_ready("Search result focus", search_result_focused(), default_timeout=2)
+    actions = ActionChains(driver)
+    actions.send_keys(Keys.ENTER)
+    actions.perform()
+    print("Enter key pressed successfully")
+    return True
+# ==================== END READINESS WAITS ====================
+
+# ==================== FAST TEXT INSERTION ====================
+# Inserts a whole message with one WebDriver call instead of one round trip per keystroke.
+# Multi-line text goes in as a synthetic paste so line breaks stay inside one message.
+INSERT_TEXT_SCRIPT = """
+const el = arguments[0], text = arguments[1];
+el.focus();
+if (text.includes("\\n")) {
+    const data = new DataTransfer();
+    data.setData("text/plain", text);
+    const paste = new ClipboardEvent("paste", {clipboardData: data, bubbles: true, cancelable: true});
+    el.dispatchEvent(paste);
+    if (paste.defaultPrevented) {
+        return "paste";  // The editor handled the paste itself
+    }
+}
+document.execCommand("insertText", false, text);
+return "insertText";
+"""
+
+def type_text_slowly(element, text):
+    """Types text key by key, using SHIFT+ENTER for line breaks within the same message."""
+    lines = text.split('\n')
+    for i, line in enumerate(lines):
+        element.send_keys(line)
+        if i < len(lines) - 1:  # Add newline for all but last line
+            element.send_keys(Keys.SHIFT + Keys.ENTER)
+
+def insert_text_fast(element, text, name="Message"):
+    """Inserts text in one call (paste/insertText); falls back to typing if verification fails."""
+    try:
+        method = driver.execute_script(INSERT_TEXT_SCRIPT, element, text)
+        if wait_until_ready(f"{name} inserted", field_text_matches(element, text), default_timeout=3):
+            print(f"{name} inserted with {method}")
+            return True
+        print(f"{name} not inserted correctly with {method} - typing it instead")
+    except Exception as e:
+        print(f"Fast text insertion failed ({str(e)}) - typing instead")
+    
+    element.clear()
+    wait_until_ready(f"{name} field cleared", field_text_matches(element, ""), default_timeout=2)
+    type_text_slowly(element, text)
+    return wait_until_ready(f"{name} typed", field_text_matches(element, text), default_timeout=5) is not None
+# ==================== END FAST TEXT INSERTION ====================
+
+# ==================== MESSAGE DELIVERY WATCHER ====================
+# Resolves once the pending clock icon (Xpath003) is gone or the newest outgoing message shows
+# a sent/delivered tick (Xpath009). A MutationObserver re-checks both XPaths on every DOM change,
+# so the result arrives within milliseconds and costs a single WebDriver round trip instead of
+# one per second.
+DELIVERY_WATCH_SCRIPT = """
+const xpath = arguments[0], tickXpath = arguments[1], appearGrace = arguments[2], timeout = arguments[3];
+const done = arguments[arguments.length - 1];
+const start = Date.now();
+const exists = (path) => document.evaluate(
+    path, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue !== null;
+const pending = () => exists(xpath);
+let seen = false, finished = false, graceTimer = null, timeoutTimer = null;
+const observer = new MutationObserver(() => check());
+const finish = (status) => {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearTimeout(graceTimer);
+    clearTimeout(timeoutTimer);
+    done({status: status, elapsed_ms: Date.now() - start});
+};
+const check = () => {
+    if (pending()) { seen = true; } else if (seen || exists(tickXpath)) { finish("sent"); }
+};
+observer.observe(document.body, {childList: true, subtree: true, attributes: true});
+// Fallback in case neither the clock icon nor a known tick icon ever renders
+graceTimer = setTimeout(() => { if (!seen && !pending()) finish("sent"); }, appearGrace);
+timeoutTimer = setTimeout(() => finish(pending() ? "pending" : "sent"), timeout);
+check();
+"""
+
+def watch_message_delivery(timeout=DELIVERY_TIMEOUT):
+    """Starts the in-page delivery watcher and returns a Future of (status, elapsed seconds)."""
+    xpath = whatsapp_xpath003
+    tick_xpath = registry_xpath("Xpath009", SENT_TICK_XPATH)
+    browser = driver
+    
+    def watch():
+        browser.set_script_timeout(timeout + 5)
+        result = browser.execute_async_script(
+            DELIVERY_WATCH_SCRIPT, xpath, tick_xpath, int(DELIVERY_APPEAR_GRACE * 1000), int(timeout * 1000))
+        return result["status"], result["elapsed_ms"] / 1000
+    
+    return delivery_executor.submit(watch)
+
+def poll_message_delivery(timeout=DELIVERY_TIMEOUT):
+    """Fallback for the watcher: polls Xpath003 once a second. Returns (status, elapsed seconds)."""
+    # Wait 5 seconds first so the pending icon has time to appear
+    print("Waiting 5 seconds before checking message status...")
+    time.sleep(5)
+    
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        try:
+            # Check if Xpath003 exists
+            WebDriverWait(driver, 1).until(
+                EC.presence_of_element_located((By.XPATH, whatsapp_xpath003)))
+            
+            # If found, update the count on the same line
+            current_second = int(time.time() - start_time) + 1
+            print(f"\rMessage pending at {current_second}(s)", end="", flush=True)
+            time.sleep(1)
+            
+        except (NoSuchElementException, TimeoutException):
+            # Xpath003 disappeared - message sent
+            return "sent", time.time() - start_time
+    return "pending", time.time() - start_time
+
+def wait_for_message_delivery(delivery, timeout=DELIVERY_TIMEOUT):
+    """Waits for a watcher Future, falling back to polling if the watcher fails."""
+    try:
+        return delivery.result(timeout=timeout + 15)
+    except Exception as e:
+        print(f"Delivery watcher unavailable ({str(e)}) - polling message status")
+        return poll_message_delivery(timeout)
+# ==================== END MESSAGE DELIVERY WATCHER ====================
+
+# ==================== BIRTHDAY LIST SNAPSHOT ====================
+def build_birthday_snapshot(values):
+    """Builds an immutable table with a day-month index from raw worksheet values."""
+    header = tuple(str(name).strip() for name in values[0]) if values else ()
+    width = len(header)
+    columns = {}
+    for index, name in enumerate(header):
+        columns.setdefault(name, index)
+    
+    rows = []
+    by_day_month = {}
+    for position, row in enumerate(values[1:]):
+        # Pad short rows so every column lookup is a plain tuple index
+        row = tuple(str(value) for value in row[:width]) + ("",) * (width - len(row))
+        rows.append(row)
+        dob = snapshot_value(columns, row, DOB_COLUMNS)
+        if len(dob) >= 5:
+            by_day_month.setdefault(dob[:5], []).append(position)
+    
+    return BirthdaySnapshot(
+        header=header,
+        columns=types.MappingProxyType(columns),
+        rows=tuple(rows),
+        by_day_month=types.MappingProxyType({key: tuple(value) for key, value in by_day_month.items()}))
+
+def snapshot_value(columns, row, column_names):
+    """Returns the first non-empty value of a row among the accepted column names."""
+    for name in column_names:
+        index = columns.get(name)
+        if index is not None and row[index]:
+            return row[index]
+    return ""
+
+def snapshot_without_rows(snapshot, positions):
+    """Returns a new snapshot with the given row positions removed (mirrors deleted sheet rows)."""
+    removed = set(positions)
+    values = [snapshot.header] + [row for position, row in enumerate(snapshot.rows) if position not in removed]
+    return build_birthday_snapshot(values)
+
+def contiguous_row_ranges(row_numbers):
+    """Collapses row numbers into sorted (first, last) ranges of consecutive rows."""
+    row_ranges = []
+    for row_num in sorted(set(row_numbers)):
+        if row_ranges and row_num == row_ranges[-1][1] + 1:
+            row_ranges[-1][1] = row_num
+        else:
+            row_ranges.append([row_num, row_num])
+    return [tuple(row_range) for row_range in row_ranges]
+
+def load_birthday_snapshot(spreadsheet, use_index=True):
+    """Downloads the "Birthday list" worksheet once in a single values request (retries forever).
+    
+    Nothing is downloaded when the local birthday index was built from the same sheet revision.
+    """
+    global birthday_snapshot, birthday_index_current
+    modified = spreadsheet_modified_time(spreadsheet)
+    note_sheet_revision(modified)
+    if use_index and modified and birthday_index_is_current(modified):
+        print("Birthday list unchanged since last run - using local birthday index")
+        birthday_snapshot = None
+        birthday_index_current = True
+        return None
+    
+    birthday_index_current = False
+    while True:
+        try:
+            wait_for_endpoint("sheets")
+            response = spreadsheet.values_batch_get(["'Birthday list'"])
+            values = response.get("valueRanges", [{}])[0].get("values", [])
+            birthday_snapshot = build_birthday_snapshot(values)
+            retry_succeeded("sheets", "step6")
+            print(f"Birthday list loaded ({len(birthday_snapshot.rows)} rows)")
+            update_birthday_index(birthday_snapshot, modified)
+            return birthday_snapshot
+            
+        except Exception as e:
+            print(f"Error reading Birthday list: {str(e)}")
+            print("Retrying step6...")
+            retry_pause("sheets", "step6")
+
+def get_birthday_snapshot(spreadsheet):
+    """Returns the snapshot of this run, downloading it on first use."""
+    if birthday_snapshot is None:
+        # Callers that need every row cannot use the index - force the download
+        return load_birthday_snapshot(spreadsheet, use_index=False)
+    return birthday_snapshot
+
+def spreadsheet_modified_time(spreadsheet):
+    """Returns the Drive modified time of the spreadsheet (one small request), or None."""
+    try:
+        if hasattr(spreadsheet, "get_lastUpdateTime"):
+            return spreadsheet.get_lastUpdateTime()
+        return spreadsheet.lastUpdateTime
+    except Exception as e:
+        print(f"Could not read spreadsheet modified time: {str(e)}")
+        return None
+
+def birthday_day_months(today):
+    """Returns the day-month keys to wish today (Feb-29 birthdays are wished on Feb-28 in non-leap years)."""
+    day_months = [today.strftime("%d-%m")]
+    if today.month == 2 and today.day == 28 and not calendar.isleap(today.year):
+        day_months.append("29-02")
+    return day_months
+
+def birthday_index_is_current(modified):
+    """Checks whether the local birthday index was built from this sheet revision."""
+    try:
+        with shelve.open(BIRTHDAY_INDEX_FILE, flag="r") as index:
+            return index.get("__modified__") == modified
+    except Exception:
+        return False
+
+def invalidate_birthday_index():
+    """Marks the local birthday index as outdated so the next run downloads the sheet."""
+    try:
+        with shelve.open(BIRTHDAY_INDEX_FILE) as index:
+            index.pop("__modified__", None)
+    except Exception as e:
+        print(f"Error invalidating birthday index: {str(e)}")
+
+def update_birthday_index(snapshot, modified):
+    """Stores the snapshot's day-month buckets on disk, rewriting only the buckets that changed."""
+    try:
+        with shelve.open(BIRTHDAY_INDEX_FILE) as index:
+            # Invalidate first so a crash in the middle of the update forces a rebuild
+            index.pop("__modified__", None)
+            header = list(snapshot.header)
+            header_changed = index.get("__header__") != header
+            index["__header__"] = header
+            
+            changed = 0
+            for day_month, positions in snapshot.by_day_month.items():
+                rows = [list(snapshot.rows[position]) for position in positions]
+                if header_changed or index.get(day_month) != rows:
+                    index[day_month] = rows
+                    changed += 1
+            for day_month in [key for key in index.keys() if not key.startswith("__")]:
+                if day_month not in snapshot.by_day_month:
+                    del index[day_month]
+                    changed += 1
+            
+            if modified:
+                index["__modified__"] = modified
+        print(f"Birthday index updated ({changed} of {len(snapshot.by_day_month)} day(s) changed)")
+    except Exception as e:
+        print(f"Error updating birthday index: {str(e)}")
+
+def todays_birthday_records(spreadsheet, today):
+    """Returns (columns, rows) of today's birthdays from the local index or the snapshot."""
+    day_months = birthday_day_months(today)
+    if birthday_snapshot is None and birthday_index_current:
+        try:
+            # Only today's buckets are read - cost does not depend on the size of the list
+            with shelve.open(BIRTHDAY_INDEX_FILE, flag="r") as index:
+                header = index.get("__header__", [])
+                rows = [tuple(row) for day_month in day_months for row in index.get(day_month, [])]
+            columns = {}
+            for position, name in enumerate(header):
+                columns.setdefault(name, position)
+            return columns, rows
+        except Exception as e:
+            print(f"Error reading birthday index, downloading Birthday list: {str(e)}")
+            invalidate_birthday_index()
+    
+    snapshot = get_birthday_snapshot(spreadsheet)
+    rows = [snapshot.rows[position] for day_month in day_months for position in snapshot.by_day_month.get(day_month, ())]
+    return snapshot.columns, rows
+# ==================== END BIRTHDAY LIST SNAPSHOT ====================
+
+# ==================== RUN JOURNAL ====================
+# Append-only, fsync'd log of today's run: one "started" record with the contact records, then
+# one record per contact state change. After a crash or power cut it is replayed to rebuild the
+# contact store, so already wished contacts are never sent a second wish.
+def run_id(today=None):
+    """Journal id of a run: the date it was started on."""
+    return (today or datetime.now()).strftime("%d-%m-%Y")
+
+def contact_id(phone_number):
+    """Journal key of a contact: the digits of its country code and WhatsApp number."""
+    return ''.join(c for c in phone_number if c.isdigit())
+
+def wish_hash(wish):
+    """Short content hash of a wish, so journal records can be compared without the full text."""
+    return hashlib.sha256(wish.encode("utf-8")).hexdigest()[:16] if wish else None
+
+def write_file_atomically(file_path, lines):
+    """Replaces a file with the given lines (write-then-rename, so a crash never leaves half a file)."""
+    temp_file = file_path + ".tmp"
+    with open(temp_file, 'w') as file:
+        file.writelines(lines)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file, file_path)
+
+def start_run_journal(contact_records):
+    """Starts today's journal with the contact records (replaces the journal of an earlier run)."""
+    record = {"run": run_id(), "state": "started", "contacts": list(contact_records)}
+    try:
+        write_file_atomically(RUN_JOURNAL_FILE, [json.dumps(record) + "\n"])
+    except OSError as e:
+        print(f"Error writing run journal: {str(e)}")
+
+def append_line_durably(file_path, line):
+    """Appends one line and fsyncs it, starting on a fresh line if a power cut left a torn last line."""
+    with open(file_path, 'ab+') as file:
+        file.seek(0, os.SEEK_END)
+        if file.tell():
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b"\n":
+                file.write(b"\n")
+        file.write((line + "\n").encode("utf-8"))
+        file.flush()
+        os.fsync(file.fileno())
+
+def append_journal_record(record):
+    """Appends one record to the run journal and fsyncs it so it survives a power cut."""
+    try:
+        append_line_durably(RUN_JOURNAL_FILE, json.dumps(dict(record, run=run_id())))
+        return True
+    except OSError as e:
+        print(f"Error writing run journal: {str(e)}")
+        return False
+
+def journal_contact(phone_number, state, timestamp=None, wish=None):
+    """Records a contact state change: sending (Enter pressed), sent or not_found."""
+    timestamp = timestamp or datetime.now().strftime("%d-%m-%Y %H:%M:%S")
+    return append_journal_record({"contact": contact_id(phone_number), "state": state,
+                                  "time": timestamp, "wish_hash": wish_hash(wish), "wish": wish})
+
+def replay_run_journal():
+    """Replays today's journal in one pass.
+    
+    Returns (contact_records, {contact id: last record}, uploaded, upload_tokens, reported) or None,
+    where upload_tokens holds the process_token of every process that began uploading today's run.
+    """
+    if not os.path.isfile(RUN_JOURNAL_FILE):
+        return None
+    
+    today = run_id()
+    contact_records = None
+    contacts = {}
+    uploaded = reported = False
+    upload_tokens = set()
+    with open(RUN_JOURNAL_FILE, 'r') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Torn last line after a power cut
+            if record.get("run") != today:
+                continue
+            state = record.get("state")
+            if state == "started":
+                contact_records, contacts, uploaded, upload_tokens = record["contacts"], {}, False, set()
+                reported = False
+            elif state == "uploading":
+                upload_tokens.add(record.get("process"))
+            elif state == "uploaded":
+                uploaded = True
+            elif state == "reported":
+                reported = True
+            elif "contact" in record:
+                contacts[record["contact"]] = record
+    
+    if contact_records is None:
+        return None
+    return contact_records, contacts, uploaded, upload_tokens, reported
+
+def journal_upload_started():
+    """True when an earlier process of today's run already began uploading to 'Sent message'."""
+    try:
+        replay = replay_run_journal()
+    except Exception as e:
+        print(f"Error reading run journal: {str(e)}")
+        return True  # Unknown - let the upload check the sheet for rows it already wrote
+    return bool(replay and replay[3] - {process_token})
+
+def resume_from_run_journal():
+    """Step 4a: Rebuild the contact store from today's journal.
+    
+    Returns True when an unfinished run was restored, "report" when its results were already
+    uploaded but the admin report was not sent yet, "finished" when it was, and False otherwise.
+    """
+    try:
+        replay = replay_run_journal()
+    except Exception as e:
+        print(f"Error reading run journal: {str(e)}")
+        return False
+    
+    if replay is None:
+        print("No run journal for today - starting a new run")
+        return False
+    
+    contact_records, contacts, uploaded, _, reported = replay
+    if reported:
+        print("Today's run already finished and its report was sent")
+        return "finished"
+    
+    done_count = 0
+    for record in contact_records:
+        state = contacts.get(record["id"])
+        if state is None:
+            continue
+        done_count += 1
+        # "sending" means Enter was pressed before the crash - count it as sent, never wish twice
+        status = "not_found" if state["state"] == "not_found" else "sent"
+        record.update(status=status, time=state["time"], wish=state["wish"])
+    
+    create_contact_store(contact_records)
+    if uploaded:
+        # Never send today's wishes again - only the report to the admin is left
+        print("Today's results are already uploaded - resuming at the report")
+        return "report"
+    print(f"Resumed today's run from the journal: {done_count} of {len(contact_records)} contacts already done")
+    return True
+# ==================== END RUN JOURNAL ====================
+
+# ==================== CONTACT STORE ====================
+# "Today birthday list contact" holds one JSON record per line, keyed by contact id:
+# {"id", "dob", "name", "country_code", "whatsapp_number", "status", "time", "wish"}
+# status is pending, sent or not_found. The file is loaded once into an in-memory index,
+# so picking the next pending contact and updating a status need no file scans.
+# A status update appends a short {"id", "status", "time", "wish"} line (O(1), fsync'd) that
+# overrides the record when loading; every CONTACT_COMPACT_EVERY updates the file is rewritten.
+NOT_FOUND_MESSAGE = "No chats, contacts or messages found"
+CONTACT_COMPACT_EVERY = 50
+
+def new_contact_record(dob, name, country_code, whatsapp_number):
+    """Returns a pending contact record."""
+    return {"id": contact_id(f"{country_code}{whatsapp_number}"), "dob": dob, "name": name,
+            "country_code": country_code, "whatsapp_number": whatsapp_number,
+            "status": "pending", "time": None, "wish": None}
+
+def contact_phone(record):
+    """Phone number of a contact as typed into WhatsApp ("CC NUMBER")."""
+    return f"{record['country_code']} {record['whatsapp_number']}"
+
+def contact_message(record):
+    """What the 'Sent message' sheet shows for a finished contact."""
+    return NOT_FOUND_MESSAGE if record["status"] == "not_found" else record["wish"]
+
+def upload_id(record):
+    """Column G of 'Sent message': identifies a contact's row of a run, so a retried upload can skip it."""
+    return f"{run_id()}/{record['id']}"
+
+def sent_message_row(record):
+    """The 'Sent message' row of a finished contact."""
+    return [
+        record["time"],             # Column A: Date-Time
+        record["dob"],              # Column B: Date of Birth
+        record["name"],             # Column C: Name
+        record["country_code"],     # Column D: Country Code
+        record["whatsapp_number"],  # Column E: WhatsApp Number
+        contact_message(record),    # Column F: Sent Message
+        upload_id(record)           # Column G: Upload id
+    ]
+
+def append_sent_rows(worksheet, records, check_existing):
+    """Appends finished contacts with one values.append request (INSERT_ROWS). Returns the rows written.
+    
+    With check_existing, upload ids already in column G (from an attempt that failed after the
+    server applied it) are skipped. Only then is a column read, so cost does not grow with history.
+    """
+    rows = [sent_message_row(record) for record in records]
+    if check_existing and rows:
+        existing = set(worksheet.col_values(7))
+        rows = [row for row in rows if row[6] not in existing]
+    if rows:
+        worksheet.append_rows(rows, value_input_option="RAW", insert_data_option="INSERT_ROWS", table_range="A1")
+    return len(rows)
+
+def index_contact_records(records):
+    """Builds the in-memory index: records by id (file order) and the queue of pending ids."""
+    global contact_store
+    by_id = collections.OrderedDict()
+    for record in records:
+        by_id.setdefault(record["id"], record)  # The same number twice gets one wish
+    pending = collections.deque(key for key, record in by_id.items() if record["status"] == "pending")
+    contact_store = {"records": by_id, "pending": pending, "appended": 0}
+    return contact_store
+
+def save_contact_store():
+    """Compacts the contact file: writes every record once, without status lines (write-then-rename)."""
+    write_file_atomically(CONTACT_FILE, [json.dumps(record) + "\n" for record in contact_store["records"].values()])
+    contact_store["appended"] = 0
+
+def create_contact_store(records):
+    """Replaces the contact file with the given records."""
+    index_contact_records(records)
+    save_contact_store()
+    return contact_store
+
+def get_contact_store():
+    """Returns the in-memory contact index, loading the contact file on first use."""
+    if contact_store is None:
+        records = collections.OrderedDict()
+        appended = 0
+        with open(CONTACT_FILE, 'r') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Blank or torn line
+                if "dob" in entry:
+                    records.setdefault(entry["id"], entry)
+                elif entry.get("id") in records:
+                    records[entry["id"]].update(entry)  # Status line
+                    appended += 1
+        index_contact_records(records.values())
+        contact_store["appended"] = appended
+    return contact_store
+
+def next_pending_contact():
+    """Returns the first contact still waiting for its wish (None when all are done)."""
+    store = get_contact_store()
+    pending = store["pending"]
+    while pending and store["records"][pending[0]]["status"] != "pending":
+        pending.popleft()  # Finished by a status update since it was queued
+    return store["records"][pending[0]] if pending else None
+
+def pending_contacts():
+    """Returns every contact still waiting for its wish."""
+    store = get_contact_store()
+    return [store["records"][key] for key in store["pending"] if store["records"][key]["status"] == "pending"]
+
+def defer_contact(phone_number):
+    """Moves a pending contact to the back of the queue, so it is retried after the others."""
+    store = get_contact_store()
+    key = contact_id(phone_number)
+    if key in store["pending"]:
+        store["pending"].remove(key)
+        store["pending"].append(key)
+
+def update_contact_status(phone_number, status, timestamp, wish=None):
+    """Marks a contact sent or not_found with one appended status line. Returns False for an unknown number."""
+    store = get_contact_store()
+    record = store["records"].get(contact_id(phone_number))
+    if record is None:
+        return False
+    record.update(status=status, time=timestamp, wish=wish)
+    append_line_durably(CONTACT_FILE, json.dumps({"id": record["id"], "status": status, "time": timestamp, "wish": wish}))
+    queue_sent_message(record)
+    store["appended"] += 1
+    if store["appended"] >= CONTACT_COMPACT_EVERY:
+        save_contact_store()
+    return True
+
+def prepare_next_contact(current_phone, wishes):
+    """Picks the contact after current_phone and its wish, so the next pass starts without local work."""
+    next_contact.clear()
+    try:
+        store = get_contact_store()
+        current_key = contact_id(current_phone) if current_phone else None
+        for key in store["pending"]:
+            record = store["records"][key]
+            if key == current_key or record["status"] != "pending":
+                continue
+            next_contact.update(id=key, phone=contact_phone(record), wish=random.choice(wishes) if wishes else None)
+            print(f"Next contact prepared: {next_contact['phone']}")
+            return
+    except Exception as e:
+        print(f"Error preparing next contact: {str(e)}")
+
+def prepared_contact(record):
+    """The prepared phone and wish of record, or None when another contact was prepared."""
+    if next_contact.get("id") != record["id"]:
+        next_contact.clear()
+        return None
+    return next_contact
+
+def take_prepared_wish(phone_number, wishes):
+    """The wish prepared for phone_number (once), or None when there is none still in wishes."""
+    if next_contact.get("phone") != phone_number:
+        return None
+    wish = next_contact.pop("wish", None)
+    return wish if wish in wishes else None
+# ==================== END CONTACT STORE ====================
 
 def step7_remove_duplicates(spreadsheet):
     """Step 7: Remove duplicate rows from spreadsheet (retries forever)."""
+    global birthday_snapshot
+    if birthday_snapshot is None and birthday_index_current:
+        # Sheet not modified since the last run removed its duplicates
+        print("No duplicate rows found (Birthday list unchanged since last run).")
+        return
     while True:
         try:
-            worksheet = spreadsheet.worksheet("Birthday list")
-            records = worksheet.get_all_records()
+            wait_for_endpoint("sheets")
+            snapshot = get_birthday_snapshot(spreadsheet)
+            # Use the correct column name from your spreadsheet: 'Counrty Code' (with typo)
+            country_code_index = snapshot.columns.get('Counrty Code')
+            whatsapp_number_index = snapshot.columns.get('WhatsApp Number')
             
             seen = set()
-            duplicate_rows = []
+            duplicate_positions = []
             
-            for i, row in enumerate(records, start=2):
-                # Use the correct column name from your spreadsheet: 'Counrty Code' (with typo)
-                country_code = str(row.get('Counrty Code', '')).strip()
-                whatsapp_number = str(row.get('WhatsApp Number', '')).strip()
+            for position, row in enumerate(snapshot.rows):
+                country_code = row[country_code_index].strip() if country_code_index is not None else ""
+                whatsapp_number = row[whatsapp_number_index].strip() if whatsapp_number_index is not None else ""
                 
                 # Create a unique key combining both country code AND WhatsApp number
                 key = f"{country_code}-{whatsapp_number}"
                 
                 if key in seen:
-                    duplicate_rows.append(i)
+                    duplicate_positions.append(position)
                 else:
                     seen.add(key)
             
-            if not duplicate_rows:
+            if not duplicate_positions:
                 print("No duplicate rows found.")
                 return
             
-            for row_num in sorted(duplicate_rows, reverse=True):
-                worksheet.delete_rows(row_num)
-                print(f"Deleted duplicate row {row_num}")
+            # Delete all duplicates with one batchUpdate instead of one delete_rows call per row
+            unchanged = sheet_unchanged_before_write(spreadsheet)
+            worksheet = spreadsheet.worksheet("Birthday list")
+            row_ranges = contiguous_row_ranges(position + 2 for position in duplicate_positions)  # Row 1 is the header
+            spreadsheet.batch_update({"requests": [
+                {
+                    "deleteDimension": {
+                        "range": {
+                            "sheetId": worksheet.id,
+                            "dimension": "ROWS",
+                            "startIndex": first_row - 1,  # Zero-based, end exclusive
+                            "endIndex": last_row
+                        }
+                    }
+                }
+                # Bottom-up so earlier deletions do not shift the rows of later ones
+                for first_row, last_row in reversed(row_ranges)
+            ]})
+            for first_row, last_row in row_ranges:
+                if first_row == last_row:
+                    print(f"Deleted duplicate row {first_row}")
+                else:
+                    print(f"Deleted duplicate rows {first_row}-{last_row}")
+            print(f"Deleted {len(duplicate_positions)} duplicate row(s) in {len(row_ranges)} range(s) "
+                  f"with 1 API request (saved {len(duplicate_positions) - 1} API call(s))")
             
+            # Keep the in-memory snapshot in step with the sheet instead of downloading it again
+            birthday_snapshot = snapshot_without_rows(snapshot, duplicate_positions)
+            update_birthday_index(birthday_snapshot, restamp_sheet_caches(unchanged, spreadsheet))
+            retry_succeeded("sheets", "step7")
             print("Duplicate removal completed.")
             break
             
         except Exception as e:
             print(f"Error during step7: {str(e)}")
             print("Retrying...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
+            # The sheet may have changed underneath the snapshot - download it again
+            birthday_snapshot = None
+            retry_pause("sheets", "step7")
                 
 def step8_filter_birthdays(spreadsheet):
     """Step 8: Filter today's birthdays and count (retries forever)."""
     global next_step, step8_message
     while True:
         try:
+            wait_for_endpoint("sheets")
             today = datetime.now()
-            current_day_month = today.strftime("%d-%m")
             
-            worksheet = spreadsheet.worksheet("Birthday list")
-            all_records = worksheet.get_all_records()
-            
-            birthday_today = []
-            for record in all_records:
-                dob = record.get('Date of Birth', '')
-                if dob.startswith(current_day_month):
-                    birthday_today.append(record)
+            columns, birthday_today = todays_birthday_records(spreadsheet, today)
+            retry_succeeded("sheets", "step8")
             
             count = len(birthday_today)
             
@@ -208,10 +1551,7 @@ def step8_filter_birthdays(spreadsheet):
         except Exception as e:
             print(f"Error during step8: {str(e)}")
             print("Retrying...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
+            retry_pause("sheets", "step8")
 
 def step9a_open_whatsapp_web():
     """Step 9a: Open WhatsApp Web with persistent profile (retries forever)."""
@@ -220,17 +1560,8 @@ def step9a_open_whatsapp_web():
         try:
             close_chrome()
             
-            # Configure Chrome options
-            chrome_options = Options()
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--start-maximized")
-            chrome_options.add_argument(f"--user-data-dir={CHROME_PROFILE_PATH}")
-            
-            # Initialize WebDriver
-            service = Service(executable_path=CHROMEDRIVER_PATH)
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-            driver.get("https://web.whatsapp.com/")
+            # Start Chromium with the shared launch profile and open WhatsApp Web
+            launch_whatsapp_web()
             
             print("Entered WhatsApp Web")
             
@@ -242,8 +1573,9 @@ def step9a_open_whatsapp_web():
                 try:
                     # Check if logged in by looking for chat list
                     WebDriverWait(driver, 5).until(
-                        EC.presence_of_element_located((By.XPATH, "//div[@aria-label='Chat list']")))
+                        EC.presence_of_element_located((By.XPATH, CHAT_LIST_XPATH)))
                     print("WhatsApp Web is ready - QR scanned successfully")
+                    record_launch_ready()
                     qr_scanned = True
                     break
                 except TimeoutException:
@@ -333,30 +1665,11 @@ def step9b_check_database_key():
             return True
 
 def step9c_fetch_xpath():
-    """Step 9c: Fetch WhatsApp Xpath001 from Firebase (retries forever)."""
+    """Step 9c: Fetch WhatsApp Xpath001 from the XPath registry (retries forever)."""
     global whatsapp_xpath001
-    while True:
-        try:
-            if not initialize_firebase():
-                raise Exception("Failed to initialize Firebase")
-            
-            whatsapp_ref = db.reference("WhatsApp/Xpath")
-            xpath_data = whatsapp_ref.get()
-            
-            if not xpath_data or "Xpath001" not in xpath_data:
-                raise Exception("Xpath001 not found in database")
-            
-            whatsapp_xpath001 = xpath_data["Xpath001"]
-            print("WhatsApp Xpath001 fetched from database")
-            return True
-            
-        except Exception as e:
-            print(f"Error fetching WhatsApp Xpath001: {str(e)}")
-            print("Retrying...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
+    whatsapp_xpath001 = get_xpath("Xpath001", "step9c")
+    print("WhatsApp Xpath001 fetched from XPath registry")
+    return True
 
 def step9d_find_and_click_xpath():
     """Step 9d: Find and click WhatsApp Xpath001 (silently refreshes every 120s if not found)."""
@@ -375,7 +1688,8 @@ def step9d_find_and_click_xpath():
                     
                 except (NoSuchElementException, TimeoutException):
                     if time.time() - start_time > 120:
-                        # Silently refresh after 120 seconds
+                        # Selector may be outdated - re-check the registry, then silently refresh after 120 seconds
+                        whatsapp_xpath001 = refresh_xpath_after_lookup_failure("Xpath001") or whatsapp_xpath001
                         driver.refresh()
                         time.sleep(5)
                         break
@@ -392,8 +1706,8 @@ def step9d_find_and_click_xpath():
 
 def step9e_check_report_number_file():
     """Step 9e: Check for Report number file (exits if missing)."""
-    report_file_path = REPORT_NUMBER_FILE
-    if not os.path.isfile(report_file_path):
+    file_exists, _ = startup_result("report_number", read_report_number)
+    if not file_exists:
         print("Report number file is missing")
         close_chrome()
         print("Closing script.")
@@ -404,21 +1718,19 @@ def step9e_check_report_number_file():
 
 def step9f_verify_report_number():
     """Step 9f: Verify report number exists in the file (exits if missing)."""
-    report_file_path = REPORT_NUMBER_FILE
     try:
-        with open(report_file_path, 'r') as file:
-            first_line = file.readline().strip()
+        _, first_line = startup_result("report_number", read_report_number)
+        
+        # Check if the line contains only digits (phone number)
+        if first_line and first_line.isdigit():
+            print(f"Report number is {first_line}")
+            return True
+        else:
+            print("Report number is unavailable inside the Report number file")
+            close_chrome()
+            print("Closing script.")
+            exit()
             
-            # Check if the line contains only digits (phone number)
-            if first_line and first_line.isdigit():
-                print(f"Report number is {first_line}")
-                return True
-            else:
-                print("Report number is unavailable inside the Report number file")
-                close_chrome()
-                print("Closing script.")
-                exit()
-                
     except Exception as e:
         print(f"Error reading Report number file: {str(e)}")
         close_chrome()
@@ -444,6 +1756,7 @@ def step9g_paste_report_number():
             time.sleep(0.5)
             
             # Type number character by character
+            mark_search_list()
             search_field.send_keys(report_number)
             time.sleep(1)
             
@@ -460,64 +1773,27 @@ def step9g_paste_report_number():
             time.sleep(2)
 
 def step9h_wait_and_press_down():
-    """Step 9h: Wait for stability and press down arrow key."""
+    """Step 9h: Wait for the search results and press down arrow key."""
     try:
-        # Wait 10 seconds for stability
-        print("Waiting 10 seconds for stability...")
-        time.sleep(10)
-        
         # Focus on the search field first
         search_field = WebDriverWait(driver, 10).until(
             EC.presence_of_element_located((By.XPATH, "//div[@contenteditable='true']"))
         )
         search_field.click()
-        time.sleep(1)
-        
-        # Press down arrow key using ActionChains for more reliability
-        actions = ActionChains(driver)
-        actions.send_keys(Keys.ARROW_DOWN)
-        actions.perform()
-        print("Down arrow key pressed successfully")
         
-        # ADD ENTER KEY PRESS
-        print("Waiting 1 second before pressing Enter...")
-        time.sleep(1)
-        actions = ActionChains(driver)
-        actions.send_keys(Keys.ENTER)
-        actions.perform()
-        print("Enter key pressed successfully")
-        
-        return True
+        # Down arrow and Enter as soon as the results are rendered (no fixed stability sleep)
+        return press_down_and_enter()
         
     except Exception as e:
         print(f"Error during step9h: {str(e)}")
         return False
 
 def step9i_fetch_xpath002():
-    """Step 9i: Fetch WhatsApp Xpath002 from Firebase (retries forever)."""
+    """Step 9i: Fetch WhatsApp Xpath002 from the XPath registry (retries forever)."""
     global whatsapp_xpath002
-    while True:
-        try:
-            if not initialize_firebase():
-                raise Exception("Failed to initialize Firebase")
-            
-            whatsapp_ref = db.reference("WhatsApp/Xpath")
-            xpath_data = whatsapp_ref.get()
-            
-            if not xpath_data or "Xpath002" not in xpath_data:
-                raise Exception("Xpath002 not found in database")
-            
-            whatsapp_xpath002 = xpath_data["Xpath002"]
-            print("WhatsApp Xpath002 fetched from database")
-            return True
-            
-        except Exception as e:
-            print(f"Error fetching WhatsApp Xpath002: {str(e)}")
-            print("Retrying step9i...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
+    whatsapp_xpath002 = get_xpath("Xpath002", "step9i")
+    print("WhatsApp Xpath002 fetched from XPath registry")
+    return True
 
 def step9j_find_and_click_xpath002():
     """Step 9j: Find and click WhatsApp Xpath002 with retry logic."""
@@ -547,6 +1823,7 @@ def step9j_find_and_click_xpath002():
             if not found:
                 # If 120 seconds passed without finding Xpath002
                 print("Xpath002 not found within 120 seconds - restarting process")
+                refresh_xpath_after_lookup_failure("Xpath002")
                 close_chrome()
                 return False
                 
@@ -577,14 +1854,13 @@ def step9k_type_message():
             message_field = WebDriverWait(driver, 10).until(
                 EC.presence_of_element_located((By.XPATH, "//div[@contenteditable='true'][@data-tab='10']")))
             
-            # Clear and type the message
+            # Clear and insert the message
             message_field.clear()
-            time.sleep(0.5)
-            message_field.send_keys(message)
-            time.sleep(1)
+            wait_until_ready("Message field cleared", field_text_matches(message_field, ""), default_timeout=2)
+            insert_text_fast(message_field, message, "Admin message")
             
             # Verify message was typed
-            if message in message_field.text:
+            if compact_text(message) in compact_text(message_field.text):
                 print(f"Admin message typed: '{message}'")
                 return True
             else:
@@ -611,61 +1887,32 @@ def step9l_wait_and_press_enter():
         actions.perform()
         print("Enter key pressed")
         
-        # Fetch Xpath003 from Firebase (retry until success)
-        while True:
-            try:
-                if not initialize_firebase():
-                    raise Exception("Failed to initialize Firebase")
-                
-                whatsapp_ref = db.reference("WhatsApp/Xpath")
-                xpath_data = whatsapp_ref.get()
-                
-                if not xpath_data or "Xpath003" not in xpath_data:
-                    raise Exception("Xpath003 not found in database")
-                
-                whatsapp_xpath003 = xpath_data["Xpath003"]
-                print("WhatsApp Xpath003 fetched from database")
-                return True
-                
-            except Exception as e:
-                print(f"Error fetching WhatsApp Xpath003: {str(e)}")
-                print("Retrying step9l...")
-                time.sleep(1)
-                
+        # Fetch Xpath003 from the XPath registry (retry until success)
+        whatsapp_xpath003 = get_xpath("Xpath003", "step9l")
+        print("WhatsApp Xpath003 fetched from XPath registry")
+        return True
+        
     except Exception as e:
         print(f"Error during step9l: {str(e)}")
         return False
 
 def step9m_check_message_status():
-    """Step 9m: Check message status by monitoring Xpath003."""
+    """Step 9m: Check message status by watching Xpath003 in the page."""
     try:
-        start_time = time.time()
-        timeout = 120  # 120 seconds timeout
-        check_interval = 1  # Check every 1 second
+        print("Watching message status...")
+        status, elapsed = wait_for_message_delivery(watch_message_delivery())
         
-        while time.time() - start_time < timeout:
-            try:
-                # Check if Xpath003 exists
-                WebDriverWait(driver, 1).until(
-                    EC.presence_of_element_located((By.XPATH, whatsapp_xpath003)))
-                
-                # If found, print countdown
-                elapsed = int(time.time() - start_time)
-                remaining = timeout - elapsed
-                print(f"Message pending at {elapsed} seconds... (Remaining: {remaining}s)")
-                time.sleep(check_interval)
-                
-            except (NoSuchElementException, TimeoutException):
-                # Xpath003 disappeared - message sent
-                print("WhatsApp Xpath003 is not available - message is sent")
-                print("Closing browser in 5 seconds...")
-                time.sleep(5)
-                close_chrome()
-                print("Script completed successfully.")
-                exit()
+        if status == "sent":
+            # Xpath003 disappeared - message sent
+            print(f"WhatsApp Xpath003 is not available - message is sent ({elapsed:.1f}s)")
+            print("Closing browser in 5 seconds...")
+            time.sleep(5)
+            close_chrome()
+            print("Script completed successfully.")
+            exit()
         
         # If we get here, timeout was reached
-        print("Xpath003 still present after 120 seconds - closing browser")
+        print(f"Xpath003 still present after {int(elapsed)} seconds - closing browser")
         close_chrome()
         return True  # Continue to step9n
         
@@ -680,17 +1927,8 @@ def step9n_open_whatsapp_web():
     try:
         close_chrome()
         
-        # Configure Chrome options
-        chrome_options = Options()
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--start-maximized")
-        chrome_options.add_argument(f"--user-data-dir={CHROME_PROFILE_PATH}")
-        
-        # Initialize WebDriver
-        service = Service(executable_path=CHROMEDRIVER_PATH)
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        driver.get("https://web.whatsapp.com/")
+        # Start Chromium with the shared launch profile and open WhatsApp Web
+        launch_whatsapp_web()
         
         print("Entered WhatsApp Web")
         return True
@@ -712,30 +1950,11 @@ def step9o_check_database_key():
             return True
 
 def step9p_fetch_xpath001():
-    """Step 9p: Fetch WhatsApp Xpath001 from Firebase (retries forever)."""
+    """Step 9p: Fetch WhatsApp Xpath001 from the XPath registry (retries forever)."""
     global whatsapp_xpath001
-    while True:
-        try:
-            if not initialize_firebase():
-                raise Exception("Failed to initialize Firebase")
-            
-            whatsapp_ref = db.reference("WhatsApp/Xpath")
-            xpath_data = whatsapp_ref.get()
-            
-            if not xpath_data or "Xpath001" not in xpath_data:
-                raise Exception("Xpath001 not found in database")
-            
-            whatsapp_xpath001 = xpath_data["Xpath001"]
-            print("WhatsApp Xpath001 fetched from database")
-            return True
-            
-        except Exception as e:
-            print(f"Error fetching WhatsApp Xpath001: {str(e)}")
-            print("Retrying step9p...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
+    whatsapp_xpath001 = get_xpath("Xpath001", "step9p")
+    print("WhatsApp Xpath001 fetched from XPath registry")
+    return True
 
 def step9q_find_and_click_xpath001():
     """Step 9q: Find and click WhatsApp Xpath001 with refresh logic."""
@@ -749,13 +1968,15 @@ def step9q_find_and_click_xpath001():
                 try:
                     element = WebDriverWait(driver, 1).until(
                         EC.presence_of_element_located((By.XPATH, whatsapp_xpath001)))
+                    record_launch_ready()
                     element.click()
                     print("WhatsApp Xpath001 is clicked ready to search phone number")
                     return True
                     
                 except (NoSuchElementException, TimeoutException):
                     if time.time() - start_time > 120:
-                        # Refresh after 120 seconds
+                        # Selector may be outdated - re-check the registry, then refresh after 120 seconds
+                        whatsapp_xpath001 = refresh_xpath_after_lookup_failure("Xpath001") or whatsapp_xpath001
                         driver.refresh()
                         print("Refreshing page after 120 seconds")
                         time.sleep(5)
@@ -824,6 +2045,7 @@ def step9t_paste_report_number():
             time.sleep(0.5)
             
             # Type number character by character
+            mark_search_list()
             search_field.send_keys(report_number)
             time.sleep(1)
             
@@ -840,34 +2062,16 @@ def step9t_paste_report_number():
             time.sleep(2)
 
 def step9u_wait_and_press_down():
-    """Step 9u: Wait for stability and press down arrow key."""
+    """Step 9u: Wait for the search results and press down arrow key."""
     try:
-        # Wait 10 seconds for stability
-        print("Waiting 10 seconds for stability...")
-        time.sleep(10)
-        
         # Focus on the search field first
         search_field = WebDriverWait(driver, 10).until(
             EC.presence_of_element_located((By.XPATH, "//div[@contenteditable='true']"))
         )
         search_field.click()
-        time.sleep(1)
         
-        # Press down arrow key using ActionChains
-        actions = ActionChains(driver)
-        actions.send_keys(Keys.ARROW_DOWN)
-        actions.perform()
-        print("Down arrow key pressed successfully")
-        
-        # ADD ENTER KEY PRESS
-        print("Waiting 1 second before pressing Enter...")
-        time.sleep(1)
-        actions = ActionChains(driver)
-        actions.send_keys(Keys.ENTER)
-        actions.perform()
-        print("Enter key pressed successfully")
-        
-        return True
+        # Down arrow and Enter as soon as the results are rendered (no fixed stability sleep)
+        return press_down_and_enter()
         
     except Exception as e:
         print(f"Error during step9u: {str(e)}")
@@ -890,11 +2094,8 @@ def step10_check_and_delete_contact_file():
 
 def step11_create_contact_file():
     """Step 11: Create new 'Today birthday list contact' file."""
-    contact_file = CONTACT_FILE
-    
     try:
-        with open(contact_file, 'w') as f:
-            pass  # Just create empty file
+        create_contact_store([])  # Just create empty file
         print("Created new 'Today birthday list contact' file")
         return True
     except Exception as e:
@@ -904,41 +2105,35 @@ def step11_create_contact_file():
 def step12_transfer_birthday_data(spreadsheet):
     """Step 12: Transfer today's birthday data to contact file with validation."""
     today = datetime.now()
-    current_day_month = today.strftime("%d-%m")
-    contact_file = CONTACT_FILE
     
     while True:
         try:
-            # Get today's birthdays from spreadsheet
-            worksheet = spreadsheet.worksheet("Birthday list")
-            all_records = worksheet.get_all_records()
+            wait_for_endpoint("sheets")
+            # Get today's birthdays from the day-month index (includes Feb-29 on Feb-28 in non-leap years)
+            columns, todays_records = todays_birthday_records(spreadsheet, today)
+            retry_succeeded("sheets", "step12")
             
             birthday_today = []
             skipped_count = 0
             
-            for record in all_records:
+            for record in todays_records:
                 # Try different possible column names for Date of Birth
-                dob = record.get('Date of Birth', '') or record.get('Date of birth', '') or record.get('DOB', '') or record.get('dob', '')
-                
-                # Check if date of birth matches today (accepts both DD-MM and DD-MM-YYYY formats)
-                if not str(dob).startswith(current_day_month):
-                    skipped_count += 1
-                    continue
+                dob = snapshot_value(columns, record, DOB_COLUMNS)
                 
                 # Try different possible column names for Country Code
-                country_code = str(record.get('Country Code', '') or record.get('country code', '') or record.get('Country code', '') or record.get('Counrty Code', '')).strip()
+                country_code = snapshot_value(columns, record, COUNTRY_CODE_COLUMNS).strip()
                 if not country_code or not country_code.isdigit():
                     skipped_count += 1
                     continue
                 
                 # Try different possible column names for WhatsApp Number
-                whatsapp_num = str(record.get('WhatsApp Number', '') or record.get('Whatsapp Number', '') or record.get('whatsapp number', '') or record.get('Phone', '')).strip()
+                whatsapp_num = snapshot_value(columns, record, WHATSAPP_NUMBER_COLUMNS).strip()
                 if not whatsapp_num or not whatsapp_num.isdigit():
                     skipped_count += 1
                     continue
                 
                 # Try different possible column names for Name
-                name = str(record.get('Name', '') or record.get('name', '')).strip()
+                name = snapshot_value(columns, record, NAME_COLUMNS).strip()
                 if not name:
                     name = "unavailable"
                 
@@ -952,18 +2147,12 @@ def step12_transfer_birthday_data(spreadsheet):
                     skipped_count += 1
                     continue
                 
-                # Format the WhatsApp URL
-                whatsapp_url = f"https://wa.me/{country_code} {whatsapp_num}|"
-                
-                # Create the line to write
-                line = f"{full_dob} {name} {whatsapp_url}\n"
-                birthday_today.append(line)
+                birthday_today.append(new_contact_record(full_dob, name, country_code, whatsapp_num))
             
             # Write to file
-            with open(contact_file, 'w') as f:
-                f.writelines(birthday_today)
+            store = create_contact_store(birthday_today)
             
-            print(f"Transferred {len(birthday_today)} birthdays to Today birthday list contact")
+            print(f"Transferred {len(store['records'])} birthdays to Today birthday list contact")
             if skipped_count > 0:
                 print(f"Skipped {skipped_count} records due to validation errors")
             return True
@@ -971,16 +2160,118 @@ def step12_transfer_birthday_data(spreadsheet):
         except Exception as e:
             print(f"Error during data transfer: {str(e)}")
             print("Retrying step12...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
+            retry_pause("sheets", "step12")
+
+# ==================== WISHES STORE ====================
+# The Wishes file holds {"modified": spreadsheet revision, "wishes": [...]} as JSON. It is loaded
+# once into memory and downloaded again only when the spreadsheet revision has changed.
+def dedupe_wishes(wishes):
+    """Drops empty and repeated wishes (compared by content hash), keeping the first of each."""
+    unique_wishes = []
+    seen = set()
+    for wish in wishes:
+        wish = wish.strip()
+        key = wish_hash(wish)
+        if key and key not in seen:
+            seen.add(key)
+            unique_wishes.append(wish)
+    return unique_wishes
+
+def save_wishes_store(wishes, modified):
+    """Replaces the Wishes file and the in-memory copy."""
+    global wishes_store
+    wishes_store = {"modified": modified, "wishes": wishes}
+    write_file_atomically(WISHES_FILE, [json.dumps(wishes_store)])
 
-def step13_check_and_delete_wishes_file():
-    """Step 13: Check and delete 'Wishes' file if it exists."""
+def load_wishes_store():
+    """Returns the wishes, reading the Wishes file on first use (None when it is missing or unreadable)."""
+    global wishes_store
+    if wishes_store is None:
+        try:
+            with open(WISHES_FILE, 'r') as file:
+                data = json.load(file)
+            wishes_store = {"modified": data.get("modified"), "wishes": list(data.get("wishes", []))}
+        except (OSError, ValueError, AttributeError):
+            return None
+    return wishes_store
+# ==================== END WISHES STORE ====================
+
+# ==================== SHEET REVISION ====================
+# The birthday index and the Wishes file are keyed on the Drive modified time of the whole
+# spreadsheet. The bot's own writes (steps 7, 15, 38 and the uploader) change that time too.
+# Right before each write the revision is read again: when it is still the one the caches were
+# checked against, the caches move to the revision after the write; when someone else edited
+# the spreadsheet in between, the caches are invalidated so the next run downloads the edit.
+def note_sheet_revision(modified):
+    """Remembers the revision the caches were just checked against (steps 6 and 13)."""
+    if modified:
+        with sheet_revision_lock:
+            sheet_revision["known"] = modified
+
+def restamp_birthday_index(previous, modified):
+    """Moves the birthday index from revision previous to modified (only if it was current)."""
+    try:
+        with shelve.open(BIRTHDAY_INDEX_FILE) as index:
+            if index.get("__modified__") == previous:
+                index["__modified__"] = modified
+    except Exception as e:
+        print(f"Error updating birthday index revision: {str(e)}")
+
+def sheet_unchanged_before_write(spreadsheet=None):
+    """Called right before a bot write: True when nobody changed the spreadsheet since the caches
+    were checked against it."""
+    try:
+        modified = spreadsheet_modified_time(spreadsheet or open_shared_spreadsheet())
+    except Exception as e:
+        print(f"Error reading sheet revision: {str(e)}")
+        return False
+    with sheet_revision_lock:
+        return bool(modified) and modified == sheet_revision["known"]
+
+def restamp_sheet_caches(unchanged, spreadsheet=None):
+    """Called after a bot write, with sheet_unchanged_before_write() from right before it.
+    
+    Returns the new revision the caches now match, or None when they were invalidated.
+    """
+    try:
+        modified = spreadsheet_modified_time(spreadsheet or open_shared_spreadsheet()) if unchanged else None
+        with sheet_revision_lock:
+            previous = sheet_revision["known"]
+            if not previous:
+                return None  # Caches already invalidated (or never checked) this run
+            store = load_wishes_store()
+            if not modified:
+                # Someone else edited the spreadsheet - do not let the caches hide that edit
+                print("Spreadsheet was edited during the run - local caches will be refreshed next run")
+                sheet_revision["known"] = None
+                invalidate_birthday_index()
+                if store and store["modified"] == previous:
+                    save_wishes_store(store["wishes"], None)
+                return None
+            sheet_revision["known"] = modified
+            restamp_birthday_index(previous, modified)
+            if store and store["modified"] == previous:
+                save_wishes_store(store["wishes"], modified)
+        return modified
+    except Exception as e:
+        print(f"Error updating sheet revision: {str(e)}")
+        return None
+# ==================== END SHEET REVISION ====================
+
+def step13_check_and_delete_wishes_file(spreadsheet):
+    """Step 13: Keep the Wishes file when the spreadsheet is unchanged, otherwise delete it."""
+    global wishes_store, wishes_sheet_modified
     wishes_file = WISHES_FILE
     
     try:
+        wishes_sheet_modified = spreadsheet_modified_time(spreadsheet)
+        note_sheet_revision(wishes_sheet_modified)
+        store = load_wishes_store()
+        if wishes_sheet_modified and store and store["wishes"] and store["modified"] == wishes_sheet_modified:
+            print(f"Wishes unchanged since last download - using 'Wishes' file ({len(store['wishes'])} wishes)")
+            return "step16"  # Nothing to download
+        
+        wishes_store = None
         if os.path.exists(wishes_file):
             os.remove(wishes_file)
             print("Deleted existing 'Wishes' file")
@@ -1005,49 +2296,61 @@ def step14_create_wishes_file():
         print(f"Error creating wishes file: {str(e)}")
         return False
 
-def step15_process_wishes_from_sheets(spreadsheet):
-    """Step 15: Process wishes from Google Sheets, remove duplicates, and transfer to file."""
-    wishes_file = WISHES_FILE
-    
+def read_wishes_column(spreadsheet):
+    """Reads column A of the Wishes worksheet (retries forever). Returns (worksheet, values)."""
     while True:
         try:
-            # Access the Wishes worksheet
+            wait_for_endpoint("sheets")
             worksheet = spreadsheet.worksheet("Wishes")
-            
-            # Get all values from column A (skip header row)
             column_a_data = worksheet.col_values(1)
+            retry_succeeded("sheets", "step15")
+            return worksheet, column_a_data
+        except Exception as e:
+            print(f"Error reading Wishes from sheets: {str(e)}")
+            print("Retrying step15...")
+            retry_pause("sheets", "step15")
+
+def prefetch_wishes_column(spreadsheet):
+    """Startup read: the Wishes column, or None when the Wishes file already holds this revision."""
+    modified = spreadsheet_modified_time(spreadsheet)
+    store = load_wishes_store()
+    if modified and store and store["wishes"] and store["modified"] == modified:
+        return None
+    return read_wishes_column(spreadsheet)
+
+def step15_process_wishes_from_sheets(spreadsheet):
+    """Step 15: Process wishes from Google Sheets, remove duplicates, and transfer to file."""
+    # Column read in the startup fan-out (step 5a) - read again only when it was not prefetched
+    prefetched = startup_result("wishes", lambda: None)
+    while True:
+        try:
+            wait_for_endpoint("sheets")
+            # Column A of the Wishes worksheet (header row included)
+            worksheet, column_a_data = prefetched or read_wishes_column(spreadsheet)
+            prefetched = None
             
             if len(column_a_data) <= 1:  # Only header or empty
                 print("No wishes data found in sheets")
+                save_wishes_store([], wishes_sheet_modified)
                 return True
                 
             # Remove header and get only the wish text
             wishes = column_a_data[1:]
             
             # Remove duplicates while preserving order
-            unique_wishes = []
-            seen = set()
-            for wish in wishes:
-                if wish and wish not in seen:  # Skip empty and duplicates
-                    unique_wishes.append(wish)
-                    seen.add(wish)
+            unique_wishes = dedupe_wishes(wishes)
             
-            # Remove duplicate rows from the worksheet
+            # Remove duplicate rows from the worksheet (one write, only when there are any)
             if len(wishes) != len(unique_wishes):
-                # Clear existing data (keeping header)
-                worksheet.batch_clear(["A2:A" + str(len(wishes) + 1)])
-                
-                # Write back unique wishes starting from row 2
-                if unique_wishes:
-                    cell_list = worksheet.range(f"A2:A{len(unique_wishes) + 1}")
-                    for i, cell in enumerate(cell_list):
-                        cell.value = unique_wishes[i]
-                    worksheet.update_cells(cell_list)
+                values = [[wish] for wish in unique_wishes] + [[""]] * (len(wishes) - len(unique_wishes))
+                unchanged = sheet_unchanged_before_write(spreadsheet)
+                worksheet.update(range_name=f"A2:A{len(wishes) + 1}", values=values)
+                print(f"Removed {len(wishes) - len(unique_wishes)} duplicate wishes from sheets")
             
             # Write unique wishes to file
-            with open(wishes_file, 'w') as f:
-                for wish in unique_wishes:
-                    f.write(wish + "\n")
+            save_wishes_store(unique_wishes, wishes_sheet_modified)
+            if len(wishes) != len(unique_wishes):
+                restamp_sheet_caches(unchanged, spreadsheet)  # The duplicate removal above changed the revision
             
             print(f"Transferred {len(unique_wishes)} unique wishes to Wishes file")
             return True
@@ -1055,26 +2358,16 @@ def step15_process_wishes_from_sheets(spreadsheet):
         except Exception as e:
             print(f"Error processing wishes from sheets: {str(e)}")
             print("Retrying step15...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
-                
+            retry_pause("sheets", "step15")
 def step16_open_whatsapp_web():
-    """Step 16: Open WhatsApp Web in Chromium browser."""
+    """Step 16: Open WhatsApp Web in Chromium browser (reuses a healthy open session)."""
     global driver
+    if KEEP_BROWSER_OPEN and is_browser_healthy():
+        print("WhatsApp Web session is already open - reusing it")
+        return True
     try:
-        # Configure Chrome options
-        chrome_options = Options()
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--start-maximized")
-        chrome_options.add_argument(f"--user-data-dir={CHROME_PROFILE_PATH}")
-        
-        # Initialize WebDriver
-        service = Service(executable_path=CHROMEDRIVER_PATH)
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        driver.get("https://web.whatsapp.com/")
+        # Start Chromium with the shared launch profile and open WhatsApp Web
+        launch_whatsapp_web()
         
         print("Entered WhatsApp Web")
         return True
@@ -1095,30 +2388,11 @@ def step17_check_database_key():
         return True
 
 def step18_fetch_xpath001():
-    """Step 18: Fetch WhatsApp Xpath001 from Firebase (retries forever)."""
+    """Step 18: Fetch WhatsApp Xpath001 from the XPath registry (retries forever)."""
     global whatsapp_xpath001
-    while True:
-        try:
-            if not initialize_firebase():
-                raise Exception("Failed to initialize Firebase")
-            
-            whatsapp_ref = db.reference("WhatsApp/Xpath")
-            xpath_data = whatsapp_ref.get()
-            
-            if not xpath_data or "Xpath001" not in xpath_data:
-                raise Exception("Xpath001 not found in database")
-            
-            whatsapp_xpath001 = xpath_data["Xpath001"]
-            print("WhatsApp Xpath001 fetched from database")
-            return True
-            
-        except Exception as e:
-            print(f"Error fetching WhatsApp Xpath001: {str(e)}")
-            print("Retrying step18...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
+    whatsapp_xpath001 = get_xpath("Xpath001", "step18")
+    print("WhatsApp Xpath001 fetched from XPath registry")
+    return True
 
 def step19_find_and_click_xpath001():
     """Step 19: Find and click WhatsApp Xpath001 with refresh logic."""
@@ -1133,13 +2407,15 @@ def step19_find_and_click_xpath001():
                     # Search for Xpath001 every second
                     element = WebDriverWait(driver, 1).until(
                         EC.presence_of_element_located((By.XPATH, whatsapp_xpath001)))
+                    record_launch_ready()
                     element.click()
                     print("WhatsApp Xpath001 is clicked ready to search phone number")
                     return True
                     
                 except (NoSuchElementException, TimeoutException):
                     if time.time() - start_time > 120:
-                        # Refresh after 120 seconds
+                        # Selector may be outdated - re-check the registry, then refresh after 120 seconds
+                        whatsapp_xpath001 = refresh_xpath_after_lookup_failure("Xpath001") or whatsapp_xpath001
                         driver.refresh()
                         print("Refreshing page after 120 seconds")
                         time.sleep(5)
@@ -1167,121 +2443,168 @@ def step20_check_contact_file():
         print("Today birthday list contact file is available")
         return True
 
-def check_and_reopen_browser_if_needed():
-    """Check if browser is open, reopen if needed."""
+def is_browser_healthy():
+    """Cheap health check of the current browser (no page reload, no element search)."""
     global driver
-    
+    if driver is None:
+        return False
     try:
-        # Try to get current URL to check if browser is still open
-        driver.current_url
-        print("Browser is already open")
-        return True  # Browser is still open
-    except:
-        # Browser is closed, need to reopen
-        print("Browser is closed, reopening WhatsApp Web...")
-        if step16_open_whatsapp_web():
-            if step17_check_database_key():
-                if step18_fetch_xpath001():
-                    if step19_find_and_click_xpath001():
-                        print("Browser reopened successfully")
-                        return True
+        # Both calls are single WebDriver round trips and fail fast on a dead session
+        if not driver.window_handles:
+            return False
+        return "web.whatsapp.com" in driver.current_url
+    except Exception:
+        return False
+
+def focus_search_field():
+    """Return to the chat list search field of an already open WhatsApp Web session."""
+    global driver, whatsapp_xpath001
+    try:
+        # Escape closes an open search or attachment menu, then the previous contact's chat. Its
+        # compose box must be gone before searching, or step 27 could type into that chat
+        for attempt in range(3):
+            actions = ActionChains(driver)
+            actions.send_keys(Keys.ESCAPE)
+            actions.perform()
+            if wait_until_ready("Previous chat closed", previous_chat_closed(), default_timeout=2):
+                break
+        else:
+            print("Previous chat is still open")
+            return False
+        
+        element = WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.XPATH, whatsapp_xpath001)))
+        element.click()
+        return True
+    except Exception as e:
+        print(f"Search field not reachable in open session: {str(e)}")
         return False
 
+def check_and_reopen_browser_if_needed(focus_search=True):
+    """Keep one WhatsApp Web session alive, relaunch only when it is actually broken."""
+    global driver
+    
+    if is_browser_healthy() and whatsapp_xpath001 and (not focus_search or focus_search_field()):
+        print("Browser is already open")
+        return True
+    
+    # Browser is closed or unusable, need to reopen
+    print("Browser is closed, reopening WhatsApp Web...")
+    close_chrome()
+    if step16_open_whatsapp_web():
+        if step17_check_database_key():
+            if step18_fetch_xpath001():
+                if step19_find_and_click_xpath001():
+                    print("Browser reopened successfully")
+                    return True
+    return False
+
+def enter_search_number(phone_number):
+    """Types a phone number into the WhatsApp chat search field (raises if it was not entered)."""
+    search_field = WebDriverWait(driver, 10).until(
+        EC.presence_of_element_located((By.XPATH, "//div[@contenteditable='true']")))
+    
+    search_field.clear()
+    wait_until_ready("Search field cleared", field_text_matches(search_field, ""), default_timeout=2)
+    mark_search_list()
+    search_field.send_keys(phone_number)
+    wait_until_ready("Search field filled", field_text_matches(search_field, phone_number), default_timeout=3)
+    
+    # Verify number was entered
+    entered_text = search_field.text.replace(" ", "")
+    expected_text = phone_number.replace(" ", "")
+    if expected_text not in entered_text:
+        raise Exception("Number not entered correctly")
+    return True
+
 def step21_process_contact_file():
     """Step 21: Process contact file and extract phone numbers."""
     global driver, extracted_phone_number
     
-    contact_file = CONTACT_FILE
-    
     while True:
         try:
-            # Read the contact file
-            with open(contact_file, 'r') as file:
-                lines = file.readlines()
-            
             # Check if file is empty
-            if not lines:
+            store = get_contact_store()
+            if not store["records"]:
                 print("No valid data in Today birthday list contact file")
                 close_chrome()
                 exit()
             
             # Check if all wishes are sent
-            all_wishes_sent = True
-            for line in lines:
-                if "|" in line:
-                    parts = line.split("|")
-                    if len(parts) < 2 or not parts[1].strip():
-                        all_wishes_sent = False
-                        break
-                else:
-                    all_wishes_sent = False
-                    break
-            
-            if all_wishes_sent:
+            contact = next_pending_contact()
+            if contact is None:
                 print("All wishes are sent")
                 return "step35", None
             
-            # Find phone number to process
-            phone_number = None
-            for line in lines:
-                line_lower = line.lower()
-                if "|" in line and "wa.me/" in line_lower:
-                    parts = line.split("|")
-                    if len(parts) < 2 or not parts[1].strip():
-                        wa_me_index = line_lower.find("wa.me/")
-                        if wa_me_index != -1:
-                            after_wa_me = line[wa_me_index + 6:]
-                            phone_end = after_wa_me.find("|")
-                            if phone_end != -1:
-                                phone_number = after_wa_me[:phone_end].strip()
-                                break
-                            else:
-                                phone_number = after_wa_me.strip()
-                                break
-            
-            if not phone_number:
-                print("No phone number found in contact file")
-                close_chrome()
-                exit()
-            
-            # Clean and format phone number
-            cleaned_phone = ''.join(c for c in phone_number if c.isdigit() or c == '+' or c == ' ')
-            
+            # Find phone number to process (prepared while the previous message was confirming)
+            prepared = prepared_contact(contact)
+            cleaned_phone = prepared["phone"] if prepared else contact_phone(contact)
             print(f"Extracted phone number: {cleaned_phone}")
             
             # Check if browser needs to be reopened
-            if not check_and_reopen_browser_if_needed():
+            if not check_and_reopen_browser_if_needed(focus_search=CHAT_OPEN_MODE != "deeplink"):
                 raise Exception("Failed to reopen browser")
             
-            # Find search field and input number
-            search_field = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, "//div[@contenteditable='true']")))
-            
-            search_field.clear()
-            time.sleep(0.5)
-            search_field.send_keys(cleaned_phone)
-            time.sleep(1)
-            
-            # Verify number was entered
-            entered_text = search_field.text.replace(" ", "")
-            expected_text = cleaned_phone.replace(" ", "")
-            
-            if expected_text in entered_text:
-                print("Mobile number transferred from Today birthday list contact to WhatsApp phone number search field")
+            if CHAT_OPEN_MODE == "deeplink":
+                # Chat is opened by step21a through its send link, no search typing needed
                 extracted_phone_number = cleaned_phone  # Store the phone number
                 return True, cleaned_phone
-            else:
-                raise Exception("Number not entered correctly")
+            
+            # Find search field and input number
+            enter_search_number(cleaned_phone)
+            print("Mobile number transferred from Today birthday list contact to WhatsApp phone number search field")
+            extracted_phone_number = cleaned_phone  # Store the phone number
+            return True, cleaned_phone
                 
         except Exception as e:
             print(f"Error during step21: {str(e)}")
             print("Retrying step21...")
             time.sleep(2)
 
+def step21a_open_chat_via_link(phone_number):
+    """Step 21a: Open the contact's chat directly through the WhatsApp Web send link."""
+    global driver
+    
+    current_time = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
+    digits = ''.join(c for c in phone_number if c.isdigit())
+    
+    def chat_or_invalid(d):
+        if d.find_elements(By.XPATH, registry_xpath("Xpath008", INVALID_PHONE_XPATH)):
+            return "invalid"
+        if d.find_elements(By.XPATH, registry_xpath("Xpath006", MESSAGE_FIELD_XPATH)):
+            return "chat"
+        return False
+    
+    try:
+        driver.get(f"https://web.whatsapp.com/send?phone={digits}")
+        outcome = wait_until_ready("Chat link", chat_or_invalid, default_timeout=CHAT_LINK_TIMEOUT, adaptive=False)
+        current_time = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
+        
+        if outcome == "invalid":
+            # Same case as Xpath004 in the search flow
+            print(f'"{current_time} No chats, contacts or messages found"')
+            # Dismiss the popup so the session stays usable for the next contact
+            actions = ActionChains(driver)
+            actions.send_keys(Keys.ESCAPE)
+            actions.perform()
+            return "step24a", current_time
+        if outcome == "chat":
+            print("Chat opened via link")
+            return "step26", current_time
+        
+        print("Chat link did not load - closing browser")
+        close_chrome()
+        return "step16", current_time
+        
+    except Exception as e:
+        print(f"Error during step21a: {str(e)}")
+        close_chrome()
+        return "step16", current_time
+
 def step22_wait_and_check_internet():
-    """Step 22: Wait 5 seconds and check internet connection."""
-    print("Waiting 5 seconds...")
-    time.sleep(5)
+    """Step 22: Wait for the search results and check internet connection."""
+    # The only search-results wait of a contact: step 24 needs it, step 25 does not repeat it
+    wait_until_ready("Search results", search_results_rendered(), default_timeout=SEARCH_RESULT_WAIT, adaptive=False)
     
     if not check_internet():
         count = 1
@@ -1294,30 +2617,13 @@ def step22_wait_and_check_internet():
     return True
 
 def step23_fetch_xpath004():
-    """Step 23: Fetch WhatsApp Xpath004 from Firebase (retries forever)."""
+    """Step 23: Fetch WhatsApp Xpath004 from the XPath registry (gives up after its retry budget)."""
     global whatsapp_xpath004
-    while True:
-        try:
-            if not initialize_firebase():
-                raise Exception("Failed to initialize Firebase")
-            
-            whatsapp_ref = db.reference("WhatsApp/Xpath")
-            xpath_data = whatsapp_ref.get()
-            
-            if not xpath_data or "Xpath004" not in xpath_data:
-                raise Exception("Xpath004 not found in database")
-            
-            whatsapp_xpath004 = xpath_data["Xpath004"]
-            print("WhatsApp Xpath004 fetched from database")
-            return True
-            
-        except Exception as e:
-            print(f"Error fetching WhatsApp Xpath004: {str(e)}")
-            print("Retrying step23...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
+    whatsapp_xpath004 = get_xpath("Xpath004", "step23")
+    if whatsapp_xpath004 is None:
+        return False
+    print("WhatsApp Xpath004 fetched from XPath registry")
+    return True
 
 def step24_search_xpath004():
     """Step 24: Search for WhatsApp Xpath004 and handle results."""
@@ -1346,9 +2652,12 @@ def step24_search_xpath004():
         return "step25", current_time  # On error, continue with step25
 
 def step24a_close_browser():
-    """Step 24a: Close the browser."""
+    """Step 24a: Close the browser (or keep the session open for the next contact)."""
     global driver
     try:
+        if KEEP_BROWSER_OPEN and is_browser_healthy():
+            print("Browser kept open for next contact")
+            return True
         close_chrome()
         print("Browser closed")
         return True
@@ -1368,37 +2677,14 @@ def step24b_check_contact_file():
         return True
 
 def step24c_update_contact_file(phone_number, timestamp_message):
-    """Step 24c: Update the contact file with the timestamp and status."""
-    contact_file = CONTACT_FILE
-    
+    """Step 24c: Update the contact store with the timestamp and status."""
     try:
-        # Read the contact file
-        with open(contact_file, 'r') as file:
-            lines = file.readlines()
+        journal_contact(phone_number, "not_found", timestamp_message)
         
-        # Find the line containing the phone number with | symbol
-        search_pattern = f"{phone_number}|"
-        line_found = None
-        line_index = -1
-        
-        for i, line in enumerate(lines):
-            if search_pattern in line:
-                line_found = line
-                line_index = i
-                break
-        
-        if line_found is None:
-            print(f"Line with {search_pattern} not found in contact file")
+        if not update_contact_status(phone_number, "not_found", timestamp_message):
+            print(f"Contact {phone_number} not found in contact file")
             return False
         
-        # Add timestamp at the beginning and status at the end
-        updated_line = f"{timestamp_message} {line_found.strip()} No chats, contacts or messages found\n"
-        lines[line_index] = updated_line
-        
-        # Write the updated content back to the file
-        with open(contact_file, 'w') as file:
-            file.writelines(lines)
-        
         print("Data updated on Today birthday list contact")
         return True
         
@@ -1407,57 +2693,23 @@ def step24c_update_contact_file(phone_number, timestamp_message):
         return False
 
 def step25_wait_and_press_down():
-    """Step 25: Wait 10 seconds for stability and press down arrow key."""
+    """Step 25: Wait for the search results and press down arrow key."""
     try:
-        # Wait 10 seconds for stability
-        print("Waiting 10 seconds for stability...")
-        time.sleep(10)
-        
-        # Press down arrow key using ActionChains
-        actions = ActionChains(driver)
-        actions.send_keys(Keys.ARROW_DOWN)
-        actions.perform()
-        print("Down arrow key pressed successfully")
-        
-        # ADD ENTER KEY PRESS
-        print("Waiting 1 second before pressing Enter...")
-        time.sleep(1)
-        actions = ActionChains(driver)
-        actions.send_keys(Keys.ENTER)
-        actions.perform()
-        print("Enter key pressed successfully")
-        
-        return True
+        # Step 22 already waited for the search results
+        return press_down_and_enter(wait_for_results=False)
         
     except Exception as e:
         print(f"Error during step25: {str(e)}")
         return False
 
 def step26_fetch_xpath002():
-    """Step 26: Fetch WhatsApp Xpath002 from Firebase (retries forever)."""
+    """Step 26: Fetch WhatsApp Xpath002 from the XPath registry (gives up after its retry budget)."""
     global whatsapp_xpath002
-    while True:
-        try:
-            if not initialize_firebase():
-                raise Exception("Failed to initialize Firebase")
-            
-            whatsapp_ref = db.reference("WhatsApp/Xpath")
-            xpath_data = whatsapp_ref.get()
-            
-            if not xpath_data or "Xpath002" not in xpath_data:
-                raise Exception("Xpath002 not found in database")
-            
-            whatsapp_xpath002 = xpath_data["Xpath002"]
-            print("WhatsApp Xpath002 fetched from database")
-            return True
-            
-        except Exception as e:
-            print(f"Error fetching WhatsApp Xpath002: {str(e)}")
-            print("Retrying step26...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
+    whatsapp_xpath002 = get_xpath("Xpath002", "step26")
+    if whatsapp_xpath002 is None:
+        return False
+    print("WhatsApp Xpath002 fetched from XPath registry")
+    return True
 
 def step27_find_and_click_xpath002():
     """Step 27: Find and click WhatsApp Xpath002 with timeout."""
@@ -1483,6 +2735,7 @@ def step27_find_and_click_xpath002():
         
         # If 120 seconds passed without finding Xpath002
         print("Xpath002 not found within 120 seconds - closing browser")
+        refresh_xpath_after_lookup_failure("Xpath002")
         close_chrome()
         return False
         
@@ -1492,61 +2745,55 @@ def step27_find_and_click_xpath002():
         return False
 
 def step28_check_wishes_file():
-    """Step 28: Check Wishes file exists and has content."""
+    """Step 28: Check Wishes are available (in memory, read from the Wishes file only once)."""
     wishes_file = WISHES_FILE
     
     # Check if file exists
-    if not os.path.isfile(wishes_file):
+    if wishes_store is None and not os.path.isfile(wishes_file):
         print("Wishes file is missing")
         close_chrome()
         print("Closing script.")
         exit()
     
     # Check if file has content
-    try:
-        with open(wishes_file, 'r') as file:
-            wishes = file.readlines()
-        
-        # Remove empty lines and whitespace
-        wishes = [wish.strip() for wish in wishes if wish.strip()]
-        
-        if not wishes:
-            print("No more wishes inside the Wishes file")
-            close_chrome()
-            print("Closing script.")
-            exit()
-        
-        print(f"Found {len(wishes)} wishes in Wishes file")
-        return wishes
-        
-    except Exception as e:
-        print(f"Error reading Wishes file: {str(e)}")
+    store = load_wishes_store()
+    if store is None:
+        print("Error reading Wishes file")
+        close_chrome()
+        print("Closing script.")
+        exit()
+    
+    wishes = store["wishes"]
+    if not wishes:
+        print("No more wishes inside the Wishes file")
         close_chrome()
         print("Closing script.")
         exit()
+    
+    print(f"Found {len(wishes)} wishes in Wishes file")
+    return wishes
 
 def step29_type_random_wish(wishes):
-    """Step 29: Type random wish into message field (using direct typing)."""
+    """Step 29: Type random wish into message field (one-call insertion, typing as fallback)."""
     try:
-        # Select a random wish
-        import random
-        random_wish = random.choice(wishes)
+        # Select a random wish (picked while the previous message was confirming, if any)
+        random_wish = take_prepared_wish(extracted_phone_number, wishes) or random.choice(wishes)
         print(f"Selected wish: {random_wish[:1000]}...")  # Show first 1000 chars
         
         # Find the message input field
         message_field = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, "//div[@contenteditable='true'][@data-tab='10']")))
+            EC.presence_of_element_located((By.XPATH, registry_xpath("Xpath006", MESSAGE_FIELD_XPATH))))
+        wait_until_ready("Compose box focus", compose_box_focused(), default_timeout=2)
         
-        # Clear and type the message character by character (like mobile number transfer)
+        # Clear the field first
         message_field.clear()
-        time.sleep(0.5)
+        wait_until_ready("Message field cleared", field_text_matches(message_field, ""), default_timeout=2)
         
-        # Type the wish character by character (same method as mobile number transfer)
-        message_field.send_keys(random_wish)
-        time.sleep(1)
+        # Insert the whole wish in one call (types it only if that fails)
+        insert_text_fast(message_field, random_wish, "Wish")
         
         # Verify message was typed
-        if random_wish in message_field.text:
+        if compact_text(random_wish) in compact_text(message_field.text):
             print("Wishes message is typed")
             return True, random_wish  # Return both success status and the wish
         else:
@@ -1557,11 +2804,9 @@ def step29_type_random_wish(wishes):
         return False, None
 
 def step30_wait_and_press_enter():
-    """Step 30: Wait 1 second and press Enter key."""
+    """Step 30: Wait for the send button and press Enter key."""
     try:
-        # Wait 1 second for stability
-        print("Waiting 1 second for stability...")
-        time.sleep(1)
+        wait_until_ready("Send button", send_button_enabled(), default_timeout=3)
         
         # Press Enter key
         actions = ActionChains(driver)
@@ -1575,67 +2820,32 @@ def step30_wait_and_press_enter():
         return False
 
 def step31_fetch_xpath003():
-    """Step 31: Fetch WhatsApp Xpath003 from Firebase (retries forever)."""
+    """Step 31: Fetch WhatsApp Xpath003 from the XPath registry (retries forever)."""
     global whatsapp_xpath003
-    
-    while True:
-        try:
-            if not initialize_firebase():
-                raise Exception("Failed to initialize Firebase")
-            
-            whatsapp_ref = db.reference("WhatsApp/Xpath")
-            xpath_data = whatsapp_ref.get()
-            
-            if not xpath_data or "Xpath003" not in xpath_data:
-                raise Exception("Xpath003 not found in database")
-            
-            whatsapp_xpath003 = xpath_data["Xpath003"]
-            print("WhatsApp Xpath003 fetched from database")
-            return True
-            
-        except Exception as e:
-            print(f"Error fetching WhatsApp Xpath003: {str(e)}")
-            print("Retrying step31...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
+    whatsapp_xpath003 = get_xpath("Xpath003", "step31")
+    print("WhatsApp Xpath003 fetched from XPath registry")
+    return True
 
 def step32_check_message_status():
-    """Step 32: Check message status by monitoring Xpath003."""
+    """Step 32: Check message status by watching Xpath003 in the page."""
     try:
-        # Wait 5 seconds first
-        print("Waiting 5 seconds before checking message status...")
-        time.sleep(5)
-        
-        start_time = time.time()
-        timeout = 120  # 120 seconds timeout
-        check_interval = 1  # Check every 1 second
-        current_second = 0
+        print("Watching message status...")
+        delivery = watch_message_delivery()
+        # The watcher runs in the page - prepare the next contact meanwhile
+        prepare_next_contact(extracted_phone_number, workflow_state.get("wishes"))
+        status, elapsed = wait_for_message_delivery(delivery)
+        current_datetime = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
         
-        while time.time() - start_time < timeout:
-            try:
-                # Check if Xpath003 exists
-                WebDriverWait(driver, 1).until(
-                    EC.presence_of_element_located((By.XPATH, whatsapp_xpath003)))
-                
-                # If found, update the count on the same line
-                current_second = int(time.time() - start_time) + 1
-                print(f"\rMessage pending at {current_second}(s)", end="", flush=True)
-                
-                time.sleep(check_interval)
-                
-            except (NoSuchElementException, TimeoutException):
-                # Xpath003 disappeared - message sent
-                current_datetime = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
-                print(f"\nWhatsApp Xpath003 is not available - message is sent at {current_datetime}")
+        if status == "sent":
+            # Xpath003 disappeared - message sent
+            print(f"\nWhatsApp Xpath003 is not available - message is sent at {current_datetime} ({elapsed:.1f}s)")
+            if not KEEP_BROWSER_OPEN:
                 print("Closing browser...")
                 close_chrome()
-                return "step36", current_datetime  # Return both next step and timestamp
+            return "step36", current_datetime  # Return both next step and timestamp
         
         # If we get here, timeout was reached
-        current_datetime = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
-        print(f"\nXpath003 still present after {current_second} seconds at {current_datetime} - closing browser")
+        print(f"\nXpath003 still present after {int(elapsed)} seconds at {current_datetime} - closing browser")
         close_chrome()
         return "step33", current_datetime  # Return both next step and timestamp
         
@@ -1646,7 +2856,7 @@ def step32_check_message_status():
         return "step33", current_datetime
 
 def step33_redo_steps_16_to_22():
-    """Step 33: Redo steps 16 to 22 only."""
+    """Step 33: Redo steps 16 to 22 only (16 to 21a in deeplink mode)."""
     print("\n=== Step 33: Redoing steps 16 to 22 ===")
     
     # Step 16: Open WhatsApp Web
@@ -1674,6 +2884,11 @@ def step33_redo_steps_16_to_22():
     if result != True:
         return False
     
+    if CHAT_OPEN_MODE == "deeplink":
+        # Step 21a: Reopen the chat through its link, no down arrow needed
+        result, timestamp = step21a_open_chat_via_link(phone_number)
+        return "step31" if result == "step26" else False
+    
     # Step 22: Wait and check internet
     if not step22_wait_and_check_internet():
         return False
@@ -1681,27 +2896,10 @@ def step33_redo_steps_16_to_22():
     return "step34"  # Continue with step34
 
 def step34_wait_and_press_down():
-    """Step 34: Wait 10 seconds for stability and press down arrow key."""
+    """Step 34: Wait for the search results and press down arrow key."""
     try:
-        # Wait 10 seconds for stability
-        print("Waiting 10 seconds for stability...")
-        time.sleep(10)
-        
-        # Press down arrow key using ActionChains
-        actions = ActionChains(driver)
-        actions.send_keys(Keys.ARROW_DOWN)
-        actions.perform()
-        print("Down arrow key pressed successfully")
-        
-        # ADD ENTER KEY PRESS
-        print("Waiting 1 second before pressing Enter...")
-        time.sleep(1)
-        actions = ActionChains(driver)
-        actions.send_keys(Keys.ENTER)
-        actions.perform()
-        print("Enter key pressed successfully")
-        
-        return True
+        # Step 22 already waited for the search results
+        return press_down_and_enter(wait_for_results=False)
         
     except Exception as e:
         print(f"Error during step34: {str(e)}")
@@ -1710,6 +2908,7 @@ def step34_wait_and_press_down():
 def step35_all_wishes_sent():
     """Step 35: All wishes are sent - final step."""
     print("\n=== Step 35: All wishes are sent ===")
+    append_journal_record({"state": "reported"})
     close_chrome()
     print("Script completed successfully.")
     exit()
@@ -1728,40 +2927,14 @@ def step36_check_contact_file():
         return True
 
 def step37_update_contact_file(phone_number, timestamp, wish_message):
-    """Step 37: Update the contact file with timestamp and wish message."""
-    contact_file = CONTACT_FILE
-    
+    """Step 37: Update the contact store with timestamp and wish message."""
     try:
-        # Read the contact file
-        with open(contact_file, 'r') as file:
-            lines = file.readlines()
+        journal_contact(phone_number, "sent", timestamp, wish_message)
         
-        # Find the line containing the phone number with | symbol
-        search_pattern = f"{phone_number}|"
-        line_found = None
-        line_index = -1
-        
-        for i, line in enumerate(lines):
-            if search_pattern in line:
-                line_found = line
-                line_index = i
-                break
-        
-        if line_found is None:
-            print(f"Line with {search_pattern} not found in contact file")
+        if not update_contact_status(phone_number, "sent", timestamp, wish_message):
+            print(f"Contact {phone_number} not found in contact file")
             return False
         
-        # Extract the original content (remove any existing timestamp or wish)
-        original_content = line_found.strip()
-        
-        # Add timestamp at the beginning and wish message at the end
-        updated_line = f"{timestamp} {original_content} {wish_message}\n"
-        lines[line_index] = updated_line
-        
-        # Write the updated content back to the file
-        with open(contact_file, 'w') as file:
-            file.writelines(lines)
-        
         print("Data updated on Today birthday list contact")
         return True
         
@@ -1771,49 +2944,14 @@ def step37_update_contact_file(phone_number, timestamp, wish_message):
 
 def step36_process_next_contact():
     """Step 36: Process the next contact after successful message sending."""
-    global extracted_phone_number
-    
     try:
-        contact_file = os.path.join(WHATSAPP_BOT_DIR, "Today birthday list contact")
-        
-        # Read the contact file
-        with open(contact_file, 'r') as file:
-            lines = file.readlines()
-        
-        # Find and mark the current phone number as processed
-        phone_found = False
-        for i, line in enumerate(lines):
-            if extracted_phone_number.replace(" ", "") in line.replace(" ", ""):
-                # Add a marker to indicate this contact has been processed
-                if "|" not in line:
-                    lines[i] = line.strip() + "|processed\n"
-                    phone_found = True
-                break
-        
-        if not phone_found:
-            print(f"Phone number {extracted_phone_number} not found in contact file")
-            return "step20"
-        
-        # Write the updated content back to the file
-        with open(contact_file, 'w') as file:
-            file.writelines(lines)
-        
-        print(f"Marked {extracted_phone_number} as processed")
-        extracted_phone_number = None  # Reset for next contact
-        
         # Check if all contacts have been processed
-        all_processed = True
-        for line in lines:
-            if "|" not in line and line.strip():  # If any line doesn't have the processed marker
-                all_processed = False
-                break
-        
-        if all_processed:
+        if next_pending_contact() is None:
             print("All contacts have been processed successfully!")
             return "step35"
-        else:
-            print("Moving to next contact...")
-            return "step20"  # Continue with next contact
+        
+        print("Moving to next contact...")
+        return "step20"  # Continue with next contact
         
     except Exception as e:
         print(f"Error during step36: {str(e)}")
@@ -1821,131 +2959,52 @@ def step36_process_next_contact():
 
 def step35_transfer_to_sheets():
     """Step 35: Transfer data to Google Sheets 'Sent message' sheet."""
-    while True:
-        try:
-            # Initialize spreadsheet connection
-            scope = ["https://spreadsheets.google.com/feeds", 
-                    "https://www.googleapis.com/auth/drive"]
-            creds = ServiceAccountCredentials.from_json_keyfile_name(SPREADSHEET_KEY, scope)
-            client = gspread.authorize(creds)
-            spreadsheet = client.open(SPREADSHEET_NAME)
-            
-            # Access the "Sent message" worksheet
-            worksheet = spreadsheet.worksheet("Sent message")
-            print("Reached sheets ready to upload")
-            return worksheet
-            
-        except Exception as e:
-            print(f"Error accessing Google Sheets: {str(e)}")
-            print("Retrying step35...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
-
-def step38_process_contact_data(worksheet):
-    """Step 38: Process contact file data and transfer to Google Sheets."""
-    contact_file = os.path.join(WHATSAPP_BOT_DIR, "Today birthday list contact")
-    
-    while True:
-        try:
-            # Read the contact file
-            with open(contact_file, 'r') as file:
-                lines = file.readlines()
-            
-            # Prepare data for Google Sheets
-            data_to_append = []
-            
-            for line in lines:
-                if not line.strip():
-                    continue
-                    
-                try:
-                    # Extract datetime (first 19 characters)
-                    datetime_str = line[:19].strip()
-                    
-                    # Extract date of birth (next 10 characters after datetime)
-                    dob_start = 20  # After first space
-                    dob_end = dob_start + 10
-                    dob_str = line[dob_start:dob_end].strip()
-                    
-                    # Extract name (between DOB and https://wa.me/)
-                    name_start = dob_end + 1
-                    wa_me_index = line.find("https://wa.me/")
-                    name_str = line[name_start:wa_me_index].strip()
-                    
-                    # Extract country code and WhatsApp number
-                    after_wa_me = line[wa_me_index + 14:]  # After "https://wa.me/"
-                    pipe_index = after_wa_me.find("|")
-                    
-                    if pipe_index == -1:
-                        continue
-                        
-                    # Get the full string before the pipe
-                    before_pipe = after_wa_me[:pipe_index].strip()
-                    
-                    # Find the last space to separate country code and WhatsApp number
-                    last_space_index = before_pipe.rfind(" ")
-                    
-                    if last_space_index == -1:
-                        # No space found, treat entire string as WhatsApp number
-                        whatsapp_num = before_pipe
-                        country_code = ""
-                    else:
-                        # Extract WhatsApp number (after last space)
-                        whatsapp_num = before_pipe[last_space_index+1:].strip()
-                        
-                        # Extract country code (before last space)
-                        country_code = before_pipe[:last_space_index].strip()
-                    
-                    # Extract sent message (after pipe)
-                    after_pipe = after_wa_me[pipe_index+1:].strip()
-                    
-                    # Append data to list
-                    data_to_append.append([
-                        datetime_str,    # Column A: Date-Time
-                        dob_str,        # Column B: Date of Birth
-                        name_str,       # Column C: Name
-                        country_code,   # Column D: Country Code
-                        whatsapp_num,   # Column E: WhatsApp Number
-                        after_pipe      # Column F: Sent Message
-                    ])
-                    
-                except Exception as e:
-                    print(f"Error parsing line: {line.strip()} - {str(e)}")
-                    continue
+    while True:
+        try:
+            wait_for_endpoint("sheets")
+            # Access the "Sent message" worksheet (shared connection, also used by the background uploader)
+            worksheet = get_sent_message_worksheet()
+            retry_succeeded("sheets", "step35")
+            print("Reached sheets ready to upload")
+            return worksheet
             
-            # Append data to Google Sheets (skip header row)
-            if data_to_append:
-                # Get the next available row
-                next_row = len(worksheet.get_all_values()) + 1
-                
-                # Update the worksheet
-                cell_range = f"A{next_row}:F{next_row + len(data_to_append) - 1}"
-                cell_list = worksheet.range(cell_range)
-                
-                # Fill the cells with data
-                cell_index = 0
-                for row in data_to_append:
-                    for value in row:
-                        cell_list[cell_index].value = value
-                        cell_index += 1
-                
-                worksheet.update_cells(cell_list)
-                print("All data transferred to sheets")
+        except Exception as e:
+            print(f"Error accessing Google Sheets: {str(e)}")
+            print("Retrying step35...")
+            retry_pause("sheets", "step35")
+
+def step38_process_contact_data(worksheet):
+    """Step 38: Flush the results the background uploader has not sent to 'Sent message' yet (safe to retry)."""
+    stop_sent_message_uploader()
+    # Rows may already be in the sheet if an earlier process of today's run was cut off
+    check_existing = uploader_state["uncertain"] or journal_upload_started()
+    while True:
+        try:
+            wait_for_endpoint("sheets")
+            finished = [record for record in get_contact_store()["records"].values()
+                        if record["status"] != "pending" and record["id"] not in uploader_state["uploaded"]]
+            
+            if finished:
+                append_journal_record({"state": "uploading", "process": process_token})
+                unchanged = sheet_unchanged_before_write()
+                written = append_sent_rows(worksheet, finished, check_existing)
+                uploader_state["uploaded"].update(record["id"] for record in finished)
+                print(f"All data transferred to sheets ({written} new rows)")
+                restamp_sheet_caches(unchanged)
             else:
-                print("No data to transfer")
-                
+                print("All data transferred to sheets")
+            
+            retry_succeeded("sheets", "step38")
+            # A restart today must not resume (and upload) this run again
+            append_journal_record({"state": "uploaded"})
             return True
             
         except Exception as e:
             print(f"Error during step38: {str(e)}")
             print("Retrying step38...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
-                
+            # The failed request may have been applied - check for our rows next time
+            check_existing = True
+            retry_pause("sheets", "step38")
 def step39_check_whatsapp_report():
     """Step 39: Check and create/delete WhatsApp report file."""
     whatsapp_report_file = WHATSAPP_REPORT_FILE
@@ -1976,17 +3035,10 @@ def step40_process_report():
             print("Today birthday list contact file is missing")
             exit()
         
-        # Read the contact file
-        with open(contact_file, 'r') as file:
-            lines = file.readlines()
-        
-        # Count total lines and keyword occurrences
-        total_lines = len(lines)
-        keyword_count = 0
-        
-        for line in lines:
-            if "No chats, contacts or messages found" in line:
-                keyword_count += 1
+        # Count contacts and not found statuses
+        records = get_contact_store()["records"].values()
+        total_lines = len(records)
+        keyword_count = sum(1 for record in records if record["status"] == "not_found")
         
         # Calculate sent messages
         sent_messages = total_lines - keyword_count
@@ -2015,20 +3067,14 @@ Sent message       = {sent_messages}
         return False
 
 def step41_open_whatsapp_web():
-    """Step 41: Open WhatsApp Web in Chromium browser."""
+    """Step 41: Open WhatsApp Web in Chromium browser (reuses a healthy open session)."""
     global driver
+    if KEEP_BROWSER_OPEN and is_browser_healthy():
+        print("WhatsApp Web session is already open - reusing it")
+        return True
     try:
-        # Configure Chrome options
-        chrome_options = Options()
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--start-maximized")
-        chrome_options.add_argument(f"--user-data-dir={CHROME_PROFILE_PATH}")
-        
-        # Initialize WebDriver
-        service = Service(executable_path=CHROMEDRIVER_PATH)
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        driver.get("https://web.whatsapp.com/")
+        # Start Chromium with the shared launch profile and open WhatsApp Web
+        launch_whatsapp_web()
         
         print("Entered WhatsApp Web")
         return True
@@ -2049,30 +3095,11 @@ def step42_check_database_key():
         return True
 
 def step43_fetch_xpath001():
-    """Step 43: Fetch WhatsApp Xpath001 from Firebase (retries forever)."""
+    """Step 43: Fetch WhatsApp Xpath001 from the XPath registry (retries forever)."""
     global whatsapp_xpath001
-    while True:
-        try:
-            if not initialize_firebase():
-                raise Exception("Failed to initialize Firebase")
-            
-            whatsapp_ref = db.reference("WhatsApp/Xpath")
-            xpath_data = whatsapp_ref.get()
-            
-            if not xpath_data or "Xpath001" not in xpath_data:
-                raise Exception("Xpath001 not found in database")
-            
-            whatsapp_xpath001 = xpath_data["Xpath001"]
-            print("WhatsApp Xpath001 fetched from database")
-            return True
-            
-        except Exception as e:
-            print(f"Error fetching WhatsApp Xpath001: {str(e)}")
-            print("Retrying step43...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
+    whatsapp_xpath001 = get_xpath("Xpath001", "step43")
+    print("WhatsApp Xpath001 fetched from XPath registry")
+    return True
 
 def step44_find_and_click_xpath001():
     """Step 44: Find and click WhatsApp Xpath001 with refresh logic."""
@@ -2087,13 +3114,15 @@ def step44_find_and_click_xpath001():
                     # Search for Xpath001 every second
                     element = WebDriverWait(driver, 1).until(
                         EC.presence_of_element_located((By.XPATH, whatsapp_xpath001)))
+                    record_launch_ready()
                     element.click()
                     print("WhatsApp Xpath001 is clicked ready to search phone number")
                     return True
                     
                 except (NoSuchElementException, TimeoutException):
                     if time.time() - start_time > 120:
-                        # Refresh after 120 seconds
+                        # Selector may be outdated - re-check the registry, then refresh after 120 seconds
+                        whatsapp_xpath001 = refresh_xpath_after_lookup_failure("Xpath001") or whatsapp_xpath001
                         driver.refresh()
                         print("Refreshing page after 120 seconds")
                         time.sleep(5)
@@ -2162,6 +3191,7 @@ def step47_paste_report_number():
             time.sleep(0.5)
             
             # Type number character by character
+            mark_search_list()
             search_field.send_keys(report_number)
             time.sleep(1)
             
@@ -2178,57 +3208,21 @@ def step47_paste_report_number():
             time.sleep(2)
 
 def step48_wait_and_press_down():
-    """Step 48: Wait 10 seconds for stability and press down arrow key."""
+    """Step 48: Wait for the search results and press down arrow key."""
     try:
-        # Wait 10 seconds for stability
-        print("Waiting 10 seconds for stability...")
-        time.sleep(10)
-        
-        # Press down arrow key using ActionChains
-        actions = ActionChains(driver)
-        actions.send_keys(Keys.ARROW_DOWN)
-        actions.perform()
-        print("Down arrow key pressed successfully")
-        
-        # ADD ENTER KEY PRESS
-        print("Waiting 1 second before pressing Enter...")
-        time.sleep(1)
-        actions = ActionChains(driver)
-        actions.send_keys(Keys.ENTER)
-        actions.perform()
-        print("Enter key pressed successfully")
-        
-        return True
+        # Down arrow and Enter as soon as the results are rendered (no fixed stability sleep)
+        return press_down_and_enter()
         
     except Exception as e:
         print(f"Error during step48: {str(e)}")
         return False
 
 def step49_fetch_xpath002():
-    """Step 49: Fetch WhatsApp Xpath002 from Firebase (retries forever)."""
+    """Step 49: Fetch WhatsApp Xpath002 from the XPath registry (retries forever)."""
     global whatsapp_xpath002
-    while True:
-        try:
-            if not initialize_firebase():
-                raise Exception("Failed to initialize Firebase")
-            
-            whatsapp_ref = db.reference("WhatsApp/Xpath")
-            xpath_data = whatsapp_ref.get()
-            
-            if not xpath_data or "Xpath002" not in xpath_data:
-                raise Exception("Xpath002 not found in database")
-            
-            whatsapp_xpath002 = xpath_data["Xpath002"]
-            print("WhatsApp Xpath002 fetched from database")
-            return True
-            
-        except Exception as e:
-            print(f"Error fetching WhatsApp Xpath002: {str(e)}")
-            print("Retrying step49...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
+    whatsapp_xpath002 = get_xpath("Xpath002", "step49")
+    print("WhatsApp Xpath002 fetched from XPath registry")
+    return True
 
 def step50_find_and_click_xpath002():
     """Step 50: Find and click WhatsApp Xpath002 with timeout."""
@@ -2255,6 +3249,7 @@ def step50_find_and_click_xpath002():
             
             # If 120 seconds passed without finding Xpath002
             print("Xpath002 not found within 120 seconds - restarting from step41")
+            refresh_xpath_after_lookup_failure("Xpath002")
             close_chrome()
             return False  # This will restart from step41
             
@@ -2281,24 +3276,17 @@ def step51_transfer_report_content():
         
         # Find the message input field
         message_field = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, "//div[@contenteditable='true'][@data-tab='10']")))
+            EC.presence_of_element_located((By.XPATH, registry_xpath("Xpath006", MESSAGE_FIELD_XPATH))))
         
         # Clear the field first
         message_field.clear()
-        time.sleep(0.5)
-        
-        # Send the entire content as a single message
-        # Use SHIFT+ENTER for newlines within the same message
-        lines = content.split('\n')
-        for i, line in enumerate(lines):
-            message_field.send_keys(line)
-            if i < len(lines) - 1:  # Add newline for all but last line
-                message_field.send_keys(Keys.SHIFT + Keys.ENTER)
+        wait_until_ready("Message field cleared", field_text_matches(message_field, ""), default_timeout=2)
         
-        time.sleep(1)
+        # Send the entire content as a single message (line breaks stay inside the message)
+        insert_text_fast(message_field, content, "Report")
         
         # Verify content was typed (check first part to avoid long comparisons)
-        if content[:100] in message_field.text:
+        if compact_text(content[:100]) in compact_text(message_field.text):
             print("WhatsApp report content transferred as single message")
             return True
         else:
@@ -2323,66 +3311,34 @@ def step52_wait_and_press_enter():
         actions.perform()
         print("Enter key pressed")
         
-        # Fetch Xpath003 from Firebase (retry until success)
-        while True:
-            try:
-                if not initialize_firebase():
-                    raise Exception("Failed to initialize Firebase")
-                
-                whatsapp_ref = db.reference("WhatsApp/Xpath")
-                xpath_data = whatsapp_ref.get()
-                
-                if not xpath_data or "Xpath003" not in xpath_data:
-                    raise Exception("Xpath003 not found in database")
-                
-                whatsapp_xpath003 = xpath_data["Xpath003"]
-                print("WhatsApp Xpath003 fetched from database")
-                return True
-                
-            except Exception as e:
-                print(f"Error fetching WhatsApp Xpath003: {str(e)}")
-                print("Retrying step52...")
-                time.sleep(1)
-                
+        # Fetch Xpath003 from the XPath registry (retry until success)
+        whatsapp_xpath003 = get_xpath("Xpath003", "step52")
+        print("WhatsApp Xpath003 fetched from XPath registry")
+        return True
+        
     except Exception as e:
         print(f"Error during step52: {str(e)}")
         return False
 
 def step53_check_message_status():
-    """Step 53: Check message status by monitoring Xpath003."""
+    """Step 53: Check message status by watching Xpath003 in the page."""
     try:
-        # Wait 5 seconds first
-        print("Waiting 5 seconds before checking message status...")
-        time.sleep(5)
-        
-        start_time = time.time()
-        timeout = 120  # 120 seconds timeout
-        check_interval = 1  # Check every 1 second
-        current_second = 0
+        print("Watching message status...")
+        status, elapsed = wait_for_message_delivery(watch_message_delivery())
         
-        while time.time() - start_time < timeout:
-            try:
-                # Check if Xpath003 exists
-                WebDriverWait(driver, 1).until(
-                    EC.presence_of_element_located((By.XPATH, whatsapp_xpath003)))
-                
-                # If found, update the count on the same line
-                current_second = int(time.time() - start_time) + 1
-                print(f"\rMessage pending at {current_second}(s)", end="", flush=True)
-                
-                time.sleep(check_interval)
-                
-            except (NoSuchElementException, TimeoutException):
-                # Xpath003 disappeared - message sent
-                print("\nWhatsApp Xpath003 is not available - message is sent")
-                print("Closing browser in 5 seconds...")
-                time.sleep(5)
-                close_chrome()
-                print("Script completed successfully.")
-                exit()
+        if status == "sent":
+            # Xpath003 disappeared - message sent
+            print(f"\nWhatsApp Xpath003 is not available - message is sent ({elapsed:.1f}s)")
+            # A restart today must not send the report again
+            append_journal_record({"state": "reported"})
+            print("Closing browser in 5 seconds...")
+            time.sleep(5)
+            close_chrome()
+            print("Script completed successfully.")
+            exit()
         
         # If we get here, timeout was reached
-        print("\nXpath003 still present after 120 seconds - closing browser")
+        print(f"\nXpath003 still present after {int(elapsed)} seconds - closing browser")
         close_chrome()
         return True  # Continue with step54
         
@@ -2392,20 +3348,14 @@ def step53_check_message_status():
         return False
 
 def step54_open_whatsapp_web():
-    """Step 54: Open WhatsApp Web in Chromium browser."""
+    """Step 54: Open WhatsApp Web in Chromium browser (reuses a healthy open session)."""
     global driver
+    if KEEP_BROWSER_OPEN and is_browser_healthy():
+        print("WhatsApp Web session is already open - reusing it")
+        return True
     try:
-        # Configure Chrome options
-        chrome_options = Options()
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--start-maximized")
-        chrome_options.add_argument(f"--user-data-dir={CHROME_PROFILE_PATH}")
-        
-        # Initialize WebDriver
-        service = Service(executable_path=CHROMEDRIVER_PATH)
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        driver.get("https://web.whatsapp.com/")
+        # Start Chromium with the shared launch profile and open WhatsApp Web
+        launch_whatsapp_web()
         
         print("Entered WhatsApp Web")
         return True
@@ -2426,30 +3376,11 @@ def step55_check_database_key():
         return True
 
 def step56_fetch_xpath001():
-    """Step 56: Fetch WhatsApp Xpath001 from Firebase (retries forever)."""
+    """Step 56: Fetch WhatsApp Xpath001 from the XPath registry (retries forever)."""
     global whatsapp_xpath001
-    while True:
-        try:
-            if not initialize_firebase():
-                raise Exception("Failed to initialize Firebase")
-            
-            whatsapp_ref = db.reference("WhatsApp/Xpath")
-            xpath_data = whatsapp_ref.get()
-            
-            if not xpath_data or "Xpath001" not in xpath_data:
-                raise Exception("Xpath001 not found in database")
-            
-            whatsapp_xpath001 = xpath_data["Xpath001"]
-            print("WhatsApp Xpath001 fetched from database")
-            return True
-            
-        except Exception as e:
-            print(f"Error fetching WhatsApp Xpath001: {str(e)}")
-            print("Retrying step56...")
-            if not check_internet():
-                wait_for_internet()
-            else:
-                time.sleep(1)
+    whatsapp_xpath001 = get_xpath("Xpath001", "step56")
+    print("WhatsApp Xpath001 fetched from XPath registry")
+    return True
 
 def step57_find_and_click_xpath001():
     """Step 57: Find and click WhatsApp Xpath001 with refresh logic."""
@@ -2464,13 +3395,15 @@ def step57_find_and_click_xpath001():
                     # Search for Xpath001 every second
                     element = WebDriverWait(driver, 1).until(
                         EC.presence_of_element_located((By.XPATH, whatsapp_xpath001)))
+                    record_launch_ready()
                     element.click()
                     print("WhatsApp Xpath001 is clicked ready to search phone number")
                     return True
                     
                 except (NoSuchElementException, TimeoutException):
                     if time.time() - start_time > 120:
-                        # Refresh after 120 seconds
+                        # Selector may be outdated - re-check the registry, then refresh after 120 seconds
+                        whatsapp_xpath001 = refresh_xpath_after_lookup_failure("Xpath001") or whatsapp_xpath001
                         driver.refresh()
                         print("Refreshing page after 120 seconds")
                         time.sleep(5)
@@ -2539,6 +3472,7 @@ def step60_paste_report_number():
             time.sleep(0.5)
             
             # Type number character by character
+            mark_search_list()
             search_field.send_keys(report_number)
             time.sleep(1)
             
@@ -2555,368 +3489,640 @@ def step60_paste_report_number():
             time.sleep(2)
 
 def step61_wait_and_press_down():
-    """Step 61: Wait 10 seconds for stability and press down arrow key."""
+    """Step 61: Wait for the search results and press down arrow key."""
     try:
-        # Wait 10 seconds for stability
-        print("Waiting 10 seconds for stability...")
-        time.sleep(10)
-        
-        # Press down arrow key using ActionChains
-        actions = ActionChains(driver)
-        actions.send_keys(Keys.ARROW_DOWN)
-        actions.perform()
-        print("Down arrow key pressed successfully")
-        
-        # ADD ENTER KEY PRESS
-        print("Waiting 1 second before pressing Enter...")
-        time.sleep(1)
-        actions = ActionChains(driver)
-        actions.send_keys(Keys.ENTER)
-        actions.perform()
-        print("Enter key pressed successfully")
+        # Down arrow and Enter as soon as the results are rendered (no fixed stability sleep)
+        return press_down_and_enter()
         
+    except Exception as e:
+        print(f"Error during step61: {str(e)}")
+        return False
+
+# ==================== SENT MESSAGE UPLOADER ====================
+# Finished contacts are queued by update_contact_status and appended to "Sent message" by a
+# background thread in batches, while the browser keeps sending. Step 38 only flushes the rest.
+def get_sent_message_worksheet():
+    """The shared 'Sent message' worksheet."""
+    global sent_message_worksheet
+    if sent_message_worksheet is None:
+        sent_message_worksheet = open_shared_spreadsheet().worksheet("Sent message")
+    return sent_message_worksheet
+
+def upload_sent_batch(batch):
+    """Appends one batch; marks the upload uncertain (column G is checked next time) when it fails."""
+    append_journal_record({"state": "uploading", "process": process_token})
+    try:
+        wait_for_endpoint("sheets")
+        unchanged = sheet_unchanged_before_write()
+        append_sent_rows(get_sent_message_worksheet(), batch, uploader_state["uncertain"])
+        uploader_state["uploaded"].update(record["id"] for record in batch)
+        uploader_state["uncertain"] = False
+        retry_succeeded("sheets", "uploader")
+        print(f"Uploaded {len(batch)} results to Sent message")
+        restamp_sheet_caches(unchanged)
         return True
+    except Exception as e:
+        print(f"Error uploading results to Sent message: {str(e)} (will retry)")
+        uploader_state["uncertain"] = True
+        return False
+
+def sent_message_uploader_loop():
+    """Background thread: uploads every UPLOAD_BATCH_SIZE results or UPLOAD_BATCH_SECONDS, until None arrives."""
+    batch = []
+    deadline = None
+    stopping = False
+    while not stopping:
+        timeout = None if deadline is None else max(0, deadline - time.monotonic())
+        try:
+            record = upload_queue.get(timeout=timeout)
+            if record is None:
+                stopping = True
+            else:
+                batch.append(record)
+                deadline = deadline or time.monotonic() + UPLOAD_BATCH_SECONDS
+        except queue.Empty:
+            pass
         
+        due = len(batch) >= UPLOAD_BATCH_SIZE or (deadline is not None and time.monotonic() >= deadline)
+        if batch and due and not stopping:
+            if upload_sent_batch(batch):
+                batch = []
+                deadline = None
+            else:
+                deadline = time.monotonic() + UPLOAD_BATCH_SECONDS
+    # Whatever is left in batch is uploaded by the step 38 flush
+
+def queue_sent_message(record):
+    """Hands a finished contact to the background uploader (step 38 uploads it if the queue is full)."""
+    global uploader_thread
+    if uploader_thread is None or not uploader_thread.is_alive():
+        uploader_thread = threading.Thread(target=sent_message_uploader_loop, name="sent-message-uploader", daemon=True)
+        uploader_thread.start()
+    try:
+        upload_queue.put_nowait(record)
+    except queue.Full:
+        pass
+
+def stop_sent_message_uploader(timeout=60):
+    """Stops the background uploader and waits until an upload in progress has finished."""
+    global uploader_thread
+    if uploader_thread is None:
+        return
+    upload_queue.put(None)
+    uploader_thread.join(timeout)
+    if uploader_thread.is_alive():
+        # The flush must not read column G before an in-flight append lands, or it appends the rows twice
+        print(f"Background upload still running after {timeout} seconds - waiting for it to finish")
+        uploader_thread.join()
+    uploader_thread = None
+# ==================== END SENT MESSAGE UPLOADER ====================
+
+# ==================== WORKER POOL ====================
+def open_contact_chat(phone_number):
+    """Opens a contact's chat in the current browser. Returns the next step like steps 21a/24."""
+    if CHAT_OPEN_MODE == "deeplink":
+        return step21a_open_chat_via_link(phone_number)
+    
+    enter_search_number(phone_number)
+    step22_wait_and_check_internet()
+    if not step23_fetch_xpath004():
+        return "failed", None
+    result, timestamp = step24_search_xpath004()
+    if result == "step25" and not step25_wait_and_press_down():
+        return "step16", timestamp
+    return ("step26" if result == "step25" else result), timestamp
+
+def send_wish_to_contact(phone_number, wishes):
+    """Runs steps 21-32 for one contact in this process's browser. Returns (status, timestamp, wish)."""
+    if not check_and_reopen_browser_if_needed(focus_search=CHAT_OPEN_MODE != "deeplink"):
+        return "failed", None, None
+    
+    result, timestamp = open_contact_chat(phone_number)
+    if result == "step24a":
+        return "not_found", timestamp, None
+    if result != "step26":
+        return "failed", timestamp, None
+    
+    if not step26_fetch_xpath002() or not step27_find_and_click_xpath002():
+        return "failed", timestamp, None
+    
+    typed, wish = step29_type_random_wish(wishes)
+    if not typed or not step30_wait_and_press_enter():
+        return "failed", timestamp, None
+    journal_contact(phone_number, "sending", wish=wish)
+    
+    step31_fetch_xpath003()
+    status, timestamp = step32_check_message_status()
+    for attempt in range(2):
+        if status == "step36":
+            break
+        # Pending after 120 s: reopen the chat and watch the message again (like step33)
+        if not check_and_reopen_browser_if_needed(focus_search=CHAT_OPEN_MODE != "deeplink"):
+            break
+        if open_contact_chat(phone_number)[0] != "step26":
+            break
+        status, timestamp = step32_check_message_status()
+    
+    # Enter was pressed, so an unconfirmed message is queued in WhatsApp - never send it twice
+    return "sent", timestamp, wish
+
+def worker_main(name, profile_path, task_queue, result_queue):
+    """Worker process (spawned, so it starts with fresh module state): sends wishes from the shared
+    queue with its own Chromium profile."""
+    global CHROME_PROFILE_PATH, worker_name
+    CHROME_PROFILE_PATH = profile_path
+    worker_name = name
+    
+    try:
+        print(f"[{name}] Starting with profile {profile_path}")
+        load_xpath_registry()
+        wishes = step28_check_wishes_file()
+        while True:
+            phone_number = task_queue.get()
+            if phone_number is None:
+                break
+            print(f"[{name}] Sending wish to {phone_number}")
+            try:
+                status, timestamp, wish = send_wish_to_contact(phone_number, wishes)
+            except Exception as e:
+                print(f"[{name}] Error sending wish to {phone_number}: {str(e)}")
+                status, timestamp, wish = "failed", None, None
+            result_queue.put((name, phone_number, status, timestamp, wish))
+    finally:
+        close_chrome()
+        result_queue.put((name, None, "done", None, None))
+
+def apply_worker_result(result):
+    """Coordinator: records one worker result in the contact file."""
+    name, phone_number, status, timestamp, wish = result
+    if status == "sent":
+        print(f"[{name}] Wish sent to {phone_number} at {timestamp}")
+        step37_update_contact_file(phone_number, timestamp, wish)
+    elif status == "not_found":
+        print(f"[{name}] {phone_number} not found on WhatsApp")
+        step24c_update_contact_file(phone_number, timestamp)
+    elif status == "failed":
+        print(f"[{name}] {phone_number} not sent - left for the main browser")
+
+def run_worker_pool():
+    """Coordinator: spreads today's pending contacts over one worker per Chromium profile."""
+    try:
+        pending_numbers = [contact_phone(record) for record in pending_contacts()]
     except Exception as e:
-        print(f"Error during step61: {str(e)}")
+        print(f"Error reading contact store for worker pool: {str(e)}")
+        return False
+    
+    if not pending_numbers:
+        print("No pending contacts for the worker pool")
+        return True
+    
+    # The coordinator's own browser must not hold a profile while workers start
+    close_chrome()
+    
+    # spawn, not fork: the monitor, listener and executor threads may hold locks at fork time
+    context = multiprocessing.get_context("spawn")
+    task_queue = context.Queue()
+    result_queue = context.Queue()
+    for phone_number in pending_numbers:
+        task_queue.put(phone_number)
+    
+    workers = []
+    for number, profile_path in enumerate(WORKER_PROFILE_PATHS, start=1):
+        task_queue.put(None)  # One stop marker per worker
+        worker = context.Process(target=worker_main, args=(f"worker{number}", profile_path, task_queue, result_queue))
+        worker.start()
+        workers.append(worker)
+    print(f"Started {len(workers)} workers for {len(pending_numbers)} contacts")
+    
+    finished = 0
+    while finished < len(workers):
+        try:
+            result = result_queue.get(timeout=5)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                # All workers are gone (crashed or exited) - their unsent contacts stay pending
+                break
+            continue
+        if result[2] == "done":
+            finished += 1
+        else:
+            apply_worker_result(result)
+    
+    # Collect results posted by workers that died before reporting "done"
+    while True:
+        try:
+            result = result_queue.get_nowait()
+        except queue.Empty:
+            break
+        if result[2] != "done":
+            apply_worker_result(result)
+    
+    for worker in workers:
+        worker.join(timeout=10)
+    print("Worker pool finished")
+    return True
+# ==================== END WORKER POOL ====================
+
+# ==================== STARTUP FAN-OUT ====================
+# Startup reads that do not depend on each other (XPaths, report number, Birthday list, Wishes)
+# are issued at once on startup_io_executor, each with its own retry, and joined before step 7
+# (or step 16 when resuming), so they cost the slowest single read instead of their sum.
+def read_report_number():
+    """Startup read: (file exists, first line) of the report number file."""
+    if not os.path.isfile(REPORT_NUMBER_FILE):
+        return False, None
+    with open(REPORT_NUMBER_FILE, 'r') as file:
+        return True, file.readline().strip()
+
+def start_startup_fetch(name, function, *args):
+    """Issues one startup read on the fan-out executor."""
+    startup_fetches[name] = startup_io_executor.submit(function, *args)
+
+def startup_result(name, function, *args):
+    """Result of the startup read `name`; calls function(*args) when it was not issued or failed."""
+    future = startup_fetches.get(name)
+    if future is not None:
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Error in startup read {name}: {str(e)}")
+    return function(*args)
+
+def start_local_fetches():
+    """Step 4: Start the XPath registry and report number reads (a new pass starts them afresh)."""
+    startup_fetches.clear()
+    start_startup_fetch("xpaths", load_xpath_registry)
+    start_startup_fetch("report_number", read_report_number)
+    print("Loading XPath registry and report number in the background")
+    return True
+
+def start_sheet_fetches():
+    """Step 5a: Start the Birthday list and Wishes reads side by side."""
+    spreadsheet = workflow_state["spreadsheet"]
+    start_startup_fetch("birthdays", load_birthday_snapshot, spreadsheet)
+    start_startup_fetch("wishes", prefetch_wishes_column, spreadsheet)
+    print("Reading Birthday list and Wishes in the background")
+    return True
+
+def join_startup_fetches():
+    """Steps 4c and 6: Wait until every startup read has finished."""
+    started = time.monotonic()
+    concurrent.futures.wait(list(startup_fetches.values()))
+    for name, future in startup_fetches.items():
+        if future.exception() is not None:
+            print(f"Error in startup read {name}: {str(future.exception())}")
+    print(f"Startup reads finished ({time.monotonic() - started:.1f}s waited)")
+    return True
+# ==================== END STARTUP FAN-OUT ====================
+
+# ==================== BROWSER WARM-UP ====================
+# Cold start costs the slower of two paths instead of their sum: WhatsApp Web is launched and
+# logged in on startup_executor while the main thread runs the spreadsheet steps (5-15).
+# Only the warm-up thread touches the driver until step 9a or 16 awaits its readiness future.
+def warm_up_browser():
+    """Opens WhatsApp Web and waits for the chat list. True when it is ready, False on timeout."""
+    launch_whatsapp_web()
+    print("Browser warm-up: entered WhatsApp Web")
+    try:
+        WebDriverWait(driver, BROWSER_WARMUP_TIMEOUT).until(
+            EC.presence_of_element_located((By.XPATH, CHAT_LIST_XPATH)))
+    except TimeoutException:
+        print(f"Browser warm-up: chat list not ready after {BROWSER_WARMUP_TIMEOUT} seconds")
+        return False
+    record_launch_ready()
+    print("Browser warm-up: chat list ready")
+    return True
+
+def start_browser_warmup():
+    """Step 4b: Start opening WhatsApp Web in the background (CONCURRENT_STARTUP)."""
+    if not CONCURRENT_STARTUP or "future" in browser_warmup:
+        return True
+    if KEEP_BROWSER_OPEN and is_browser_healthy():
+        return True
+    browser_warmup["future"] = startup_executor.submit(warm_up_browser)
+    print("Opening WhatsApp Web in the background")
+    return True
+
+def await_browser_warmup():
+    """Waits for the background browser launch. Returns its readiness (True/False), or None when
+    no warm-up was running or it failed."""
+    future = browser_warmup.pop("future", None)
+    if future is None:
+        return None
+    waited = time.monotonic()
+    try:
+        ready = future.result()
+    except Exception as e:
+        print(f"Error warming up browser: {str(e)}")
+        return None
+    waited = time.monotonic() - waited
+    if waited >= 1:
+        print(f"Waited {waited:.1f}s for the browser warm-up")
+    return ready
+
+def open_warm_whatsapp_web():
+    """Step 16: Use the browser opened during steps 5-15, or open WhatsApp Web now."""
+    if await_browser_warmup() is not None and is_browser_healthy():
+        print("Using WhatsApp Web opened in the background")
+        return True
+    return step16_open_whatsapp_web()
+
+def open_warm_whatsapp_web_for_report():
+    """Step 9a: Use the background browser once its chat list is ready, otherwise (re)open it."""
+    if await_browser_warmup() and is_browser_healthy():
+        print("Using WhatsApp Web opened in the background")
+        return True
+    return step9a_open_whatsapp_web()
+# ==================== END BROWSER WARM-UP ====================
+
+# ==================== STEP GRAPH ====================
+# Every step is a node: (title, action, transitions). The action returns an outcome and the
+# transitions map it to the next node (ANY_OUTCOME matches whatever else was returned).
+# An outcome without a transition ends the pass; the main loop then resumes at resume_node().
+ANY_OUTCOME = "*"
+
+def proceed(function, *args):
+    """Runs a step that retries internally (its result is not a branch) and continues."""
+    function(*args)
+    return True
+
+def store_result(key, step_result):
+    """Keeps the value of an (outcome, value) step result in workflow_state and returns the outcome."""
+    outcome, workflow_state[key] = step_result
+    return outcome
+
+def check_spreadsheet_key():
+    """Step 3: Exits when the spreadsheet access key is missing."""
+    if not check_file_exists(SPREADSHEET_KEY):
+        print("Spread sheet access key is not available")
+        print("Closing browser and script.")
+        exit()
+    print("Spread sheet access key is available")
+    return True
+
+def open_spreadsheet():
+    """Step 5: Access Google Spreadsheet (retries forever)."""
+    workflow_state["spreadsheet"] = initialize_spreadsheet()
+    print("Reached the spread sheet")
+    return True
+
+def filter_birthdays():
+    """Step 8: Filter today's birthdays; the outcome is the branch step8 chose (step9a or step10)."""
+    step8_filter_birthdays(workflow_state["spreadsheet"])
+    return next_step
+
+def run_worker_pool_once():
+    """Step 20a: Parallel sending when several WhatsApp profiles are configured."""
+    if len(WORKER_PROFILE_PATHS) > 1 and not workflow_state.get("worker_pool_finished"):
+        workflow_state["worker_pool_finished"] = run_worker_pool()
+    return True
+
+def process_contact_file():
+    """Step 21: Pick the next contact; the outcome is how its chat is opened (or step35 when done)."""
+    result, phone_number = step21_process_contact_file()
+    if result == "step35" or not result:
+        return result
+    # Step 21a replaces the search steps 22-25
+    return "step21a" if CHAT_OPEN_MODE == "deeplink" else "step22"
+
+def press_enter_and_journal():
+    """Step 30: Send the wish, then journal it so a restart never sends it again."""
+    if not step30_wait_and_press_enter():
         return False
+    journal_contact(extracted_phone_number, "sending", wish=workflow_state["wish"])
+    return True
+
+def start_journal():
+    """Step 15a: Start today's journal once the contact file and the wishes are ready."""
+    start_run_journal(get_contact_store()["records"].values())
+    print("Run journal started")
+    return True
+
+def exit_finished_run():
+    """Today's run already sent its report: nothing is left to do."""
+    print("Closing script.")
+    close_chrome()
+    exit()
+
+def defer_current_contact():
+    """A step gave up on the current contact: move on to the next one and retry it later."""
+    print(f"Moving on to the next contact - {extracted_phone_number} will be retried later")
+    defer_contact(extracted_phone_number)
+    return True
+
+def load_wishes():
+    """Step 28: Check wishes file and keep its wishes for step 29."""
+    workflow_state["wishes"] = step28_check_wishes_file()
+    return bool(workflow_state["wishes"])
+
+def restart_after_step33_error():
+    """Step 33 failed: close the browser and try step 33 again from step 31."""
+    print("Error in step33, restarting process...")
+    close_chrome()
+    time.sleep(5)
+    return True
+
+def transfer_to_sheets():
+    """Step 35: Transfer data to Google Sheets and keep the worksheet for step 38."""
+    workflow_state["worksheet"] = step35_transfer_to_sheets()
+    return True
+
+def step_chain(steps, last_next=None):
+    """Builds nodes that each continue to the next one on a True outcome."""
+    nodes = {}
+    for index, (node, title, action) in enumerate(steps):
+        following = steps[index + 1][0] if index + 1 < len(steps) else last_next
+        nodes[node] = (title, action, {True: following} if following else {})
+    return nodes
+
+STEP_GRAPH = {}
+
+# Steps 1-8: startup (run while no contact has been picked yet)
+STEP_GRAPH.update(step_chain([
+    ("step1", "Step 1: Checking for and closing open Chrome browsers", lambda: proceed(close_chrome)),
+    ("step2", "Step 2: Checking internet connection", lambda: proceed(wait_for_internet)),
+    ("step3", "Step 3: Checking for the spreadsheet access key", check_spreadsheet_key),
+    # Load XPaths once (local cache, kept fresh by a database listener) while the next steps run
+    ("step4", "Step 4: Loading XPath registry and report number", start_local_fetches),
+], last_next="step4a"))
+# An unfinished run of today resumes at step 16 without re-reading the sheet, an uploaded one at
+# the report (step 39); a run whose report was sent is not repeated
+STEP_GRAPH["step4a"] = ("Step 4a: Checking run journal", resume_from_run_journal,
+                        {True: "step4c", "report": "step4d", "finished": "step4_exit", False: "step4b"})
+STEP_GRAPH["step4c"] = ("Step 4c: Waiting for startup reads", join_startup_fetches, {True: "step16"})
+STEP_GRAPH["step4d"] = ("Step 4d: Waiting for startup reads", join_startup_fetches, {True: "step39"})
+STEP_GRAPH["step4_exit"] = (None, exit_finished_run, {})
+STEP_GRAPH.update(step_chain([
+    ("step4b", "Step 4b: Starting browser warm-up" if CONCURRENT_STARTUP else None, start_browser_warmup),
+    ("step5", "Step 5: Accessing Google Spreadsheet", open_spreadsheet),
+    # Download Birthday list (once for steps 7, 8 and 12) and Wishes (step 15) side by side
+    ("step5a", "Step 5a: Reading Birthday list and Wishes", start_sheet_fetches),
+    ("step6", "Step 6: Waiting for startup reads", join_startup_fetches),
+    ("step7", "Step 7: Removing duplicate rows", lambda: proceed(step7_remove_duplicates, workflow_state["spreadsheet"])),
+], last_next="step8"))
+STEP_GRAPH["step8"] = ("Step 8: Filtering today's birthdays", filter_birthdays, {"step9a": "step9a", "step10": "step10"})
+
+# Steps 9a-9m: no birthdays today - report it to the admin and exit
+STEP_GRAPH.update(step_chain([
+    ("step9a", "Step 9a: Opening WhatsApp Web", open_warm_whatsapp_web_for_report),
+    ("step9b", "Step 9b: Checking database key", step9b_check_database_key),
+    ("step9c", "Step 9c: Fetching Xpath001", step9c_fetch_xpath),
+    ("step9d", "Step 9d: Finding and clicking Xpath001", step9d_find_and_click_xpath),
+    ("step9e", "Step 9e: Checking report number file", step9e_check_report_number_file),
+    ("step9f", "Step 9f: Verifying report number", step9f_verify_report_number),
+    ("step9g", "Step 9g: Pasting report number", step9g_paste_report_number),
+    ("step9h", "Step 9h: Waiting and pressing down", step9h_wait_and_press_down),
+    ("step9i", "Step 9i: Fetching Xpath002", step9i_fetch_xpath002),
+    ("step9j", "Step 9j: Finding and clicking Xpath002", step9j_find_and_click_xpath002),
+    ("step9k", "Step 9k: Typing admin message", step9k_type_message),
+    ("step9l", "Step 9l: Waiting and pressing enter", step9l_wait_and_press_enter),
+    ("step9m", "Step 9m: Checking message status", step9m_check_message_status),
+    # Message sent successfully, exit
+    ("step9_exit", None, exit),
+]))
+
+# Steps 10-19: build today's contact and wishes files, then open WhatsApp Web
+STEP_GRAPH.update(step_chain([
+    ("step10", "Step 10: Checking and deleting contact file", step10_check_and_delete_contact_file),
+    ("step11", "Step 11: Creating new contact file", step11_create_contact_file),
+    ("step12", "Step 12: Transferring birthday data", lambda: step12_transfer_birthday_data(workflow_state["spreadsheet"])),
+], last_next="step13"))
+# Wishes unchanged since the last download (step16): steps 14 and 15 are skipped
+STEP_GRAPH["step13"] = ("Step 13: Checking Wishes file", lambda: step13_check_and_delete_wishes_file(workflow_state["spreadsheet"]),
+                        {"step14": "step14", "step15": "step15", "step16": "step15a"})
+STEP_GRAPH.update(step_chain([
+    ("step14", "Step 14: Creating new Wishes file", step14_create_wishes_file),
+    ("step15", "Step 15: Processing wishes from sheets", lambda: step15_process_wishes_from_sheets(workflow_state["spreadsheet"])),
+    # From here on a restart resumes at step 16 - contacts and wishes are both ready
+    ("step15a", "Step 15a: Starting run journal", start_journal),
+    ("step16", "Step 16: Opening WhatsApp Web", open_warm_whatsapp_web),
+    ("step17", "Step 17: Checking database key", step17_check_database_key),
+    ("step18", "Step 18: Fetching Xpath001", step18_fetch_xpath001),
+    ("step19", "Step 19: Finding and clicking Xpath001", step19_find_and_click_xpath001),
+], last_next="step20a"))
+
+# Steps 20-34: send one wish per pass
+STEP_GRAPH.update({
+    "step20a": ("Step 20a: Sending wishes with worker pool" if len(WORKER_PROFILE_PATHS) > 1 else None,
+                run_worker_pool_once, {True: "step20"}),
+    "step20": ("Step 20: Checking contact file", step20_check_contact_file, {True: "step21"}),
+    "step21": ("Step 21: Processing contact file", process_contact_file,
+               {"step35": "step35", "step21a": "step21a", "step22": "step22"}),
+    # Chat link did not load (step16): the browser was closed - the next pass reopens it for this contact
+    "step21a": ("Step 21a: Opening chat via link",
+                lambda: store_result("timestamp", step21a_open_chat_via_link(extracted_phone_number)),
+                {"step24a": "step24a", "step26": "step26"}),
+    "step22": ("Step 22: Waiting and checking internet", step22_wait_and_check_internet, {True: "step23"}),
+    "step23": ("Step 23: Fetching Xpath004", step23_fetch_xpath004, {True: "step24", False: "step_defer"}),
+    "step24": ("Step 24: Searching for Xpath004", lambda: store_result("timestamp", step24_search_xpath004()),
+               {"step24a": "step24a", "step25": "step25"}),
+    "step24a": ("Step 24a: Closing browser", step24a_close_browser, {True: "step24b"}),
+    "step24b": ("Step 24b: Checking contact file", step24b_check_contact_file, {True: "step24c"}),
+    # Returns to step 20 with the next pass
+    "step24c": ("Step 24c: Updating contact file",
+                lambda: step24c_update_contact_file(extracted_phone_number, workflow_state["timestamp"]), {}),
+    "step25": ("Step 25: Waiting and pressing down", step25_wait_and_press_down, {True: "step26"}),
+    "step26": ("Step 26: Fetching Xpath002", step26_fetch_xpath002, {True: "step27", False: "step_defer"}),
+    # Step 23 or 26 used up its retry budget - the next pass continues with the next contact
+    "step_defer": (None, defer_current_contact, {}),
+    # Xpath002 not found within 120 seconds: reopen WhatsApp Web (steps 16-19) and return to step 20
+    "step27": ("Step 27: Finding and clicking Xpath002", step27_find_and_click_xpath002, {True: "step28", False: "step16"}),
+    "step28": ("Step 28: Checking wishes file", load_wishes, {True: "step29"}),
+    "step29": ("Step 29: Typing random wish",
+               lambda: store_result("wish", step29_type_random_wish(workflow_state["wishes"])), {True: "step30"}),
+    "step30": ("Step 30: Waiting and pressing enter", press_enter_and_journal, {True: "step31"}),
+    "step31": ("Step 31: Fetching Xpath003", step31_fetch_xpath003, {True: "step32"}),
+    "step32": ("Step 32: Checking message status", lambda: store_result("timestamp", step32_check_message_status()),
+               {"step36": "step36", "step33": "step33"}),
+    # step31: chat reopened via link
+    "step33": ("Step 33: Redoing steps 16 to 22", step33_redo_steps_16_to_22,
+               {"step31": "step31", "step34": "step34", ANY_OUTCOME: "step33_error"}),
+    "step33_error": (None, restart_after_step33_error, {True: "step31"}),
+    "step34": ("Step 34: Waiting and pressing down", step34_wait_and_press_down, {True: "step31"}),
+    "step36": ("Step 36: Checking contact file", step36_check_contact_file, {True: "step37"}),
+    "step37": ("Step 37: Updating contact file",
+               lambda: step37_update_contact_file(extracted_phone_number, workflow_state["timestamp"], workflow_state["wish"]),
+               {True: "step36_next"}),
+    "step36_next": (None, step36_process_next_contact, {"step35": "step35", "step20": "step20a"}),
+})
+
+# Steps 35-61: upload the results, send the report to the admin and exit
+STEP_GRAPH.update(step_chain([
+    ("step35", "Step 35: Transferring data to Google Sheets", transfer_to_sheets),
+    ("step38", "Step 38: Processing contact data", lambda: step38_process_contact_data(workflow_state["worksheet"])),
+    ("step39", "Step 39: Checking WhatsApp report file", step39_check_whatsapp_report),
+    ("step40", "Step 40: Processing report", step40_process_report),
+    ("step41", "Step 41: Opening WhatsApp Web", step41_open_whatsapp_web),
+    ("step42", "Step 42: Checking database key", step42_check_database_key),
+    ("step43", "Step 43: Fetching Xpath001", step43_fetch_xpath001),
+    ("step44", "Step 44: Finding and clicking Xpath001", step44_find_and_click_xpath001),
+    ("step45", "Step 45: Checking report number file", step45_check_report_number_file),
+    ("step46", "Step 46: Verifying report number", step46_verify_report_number),
+    ("step47", "Step 47: Pasting report number", step47_paste_report_number),
+    ("step48", "Step 48: Waiting and pressing down", step48_wait_and_press_down),
+    ("step49", "Step 49: Fetching Xpath002", step49_fetch_xpath002),
+    ("step50", "Step 50: Finding and clicking Xpath002", step50_find_and_click_xpath002),
+    ("step51", "Step 51: Transferring report content", step51_transfer_report_content),
+    ("step52", "Step 52: Waiting and pressing enter", step52_wait_and_press_enter),
+    ("step53", "Step 53: Checking message status", step53_check_message_status),
+    ("step54", "Step 54: Opening WhatsApp Web", step54_open_whatsapp_web),
+    ("step55", "Step 55: Checking database key", step55_check_database_key),
+    ("step56", "Step 56: Fetching Xpath001", step56_fetch_xpath001),
+    ("step57", "Step 57: Finding and clicking Xpath001", step57_find_and_click_xpath001),
+    ("step58", "Step 58: Checking report number file", step58_check_report_number_file),
+    ("step59", "Step 59: Verifying report number", step59_verify_report_number),
+    ("step60", "Step 60: Pasting report number", step60_paste_report_number),
+    ("step61", "Step 61: Waiting and pressing down", step61_wait_and_press_down),
+    ("step35_exit", None, step35_all_wishes_sent),
+]))
+
+def resume_node():
+    """Where a new pass starts: startup until a contact has been picked, then the contact file."""
+    return "step1" if extracted_phone_number is None else "step20a"
+
+def run_step_graph(node):
+    """Runs nodes from `node` until an outcome has no transition, timing every step."""
+    while node is not None:
+        title, action, transitions = STEP_GRAPH[node]
+        if title:
+            print(f"\n=== {title} ===")
+        started = time.perf_counter()
+        try:
+            outcome = action()
+        finally:
+            step_timings[node].append(time.perf_counter() - started)
+        node = transitions.get(outcome, transitions.get(ANY_OUTCOME))
+
+def print_step_timings():
+    """Prints the time spent in each step this run, slowest first."""
+    if not step_timings:
+        return
+    print("\n=== Step timings ===")
+    for node, durations in sorted(step_timings.items(), key=lambda item: sum(item[1]), reverse=True):
+        print(f"{node}: {sum(durations):.1f}s over {len(durations)} run(s)")
+    if browser_launch_timings:
+        launches = ", ".join(f"{elapsed:.1f}s" for elapsed in browser_launch_timings)
+        print(f"Browser launch to chat list ready: {launches}")
+# ==================== END STEP GRAPH ====================
 
 # Main execution loop
 if __name__ == "__main__":
     # Global variable to store extracted phone number
     extracted_phone_number = None
-    skip_to_step31 = False
-    selected_wish_stored = None
     
-    # Main execution loop
+    # Main execution loop: one pass through the step graph per iteration
     while True:
         try:
-            # Check if we need to skip to step31
-            if skip_to_step31:
-                print("\n=== Step 31: Fetching Xpath003 ===")
-                if step31_fetch_xpath003():
-                    print("\n=== Step 32: Checking message status ===")
-                    next_step_after_32, timestamp = step32_check_message_status()
-                    
-                    if next_step_after_32 == "step36":
-                        print("\n=== Step 36: Checking contact file ===")
-                        if step36_check_contact_file():
-                            print("\n=== Step 37: Updating contact file ===")
-                            if step37_update_contact_file(extracted_phone_number, timestamp, selected_wish_stored):
-                                next_step = step36_process_next_contact()
-                                if next_step == "step35":
-                                    # ADD STEP 35 HERE
-                                    print("\n=== Step 35: Transferring data to Google Sheets ===")
-                                    worksheet = step35_transfer_to_sheets()
-                                    
-                                    # ADD STEP 38 HERE
-                                    print("\n=== Step 38: Processing contact data ===")
-                                    if step38_process_contact_data(worksheet):
-                                        # ADD STEP 39 HERE
-                                        print("\n=== Step 39: Checking WhatsApp report file ===")
-                                        if step39_check_whatsapp_report():
-                                            # ADD STEP 40 HERE
-                                            print("\n=== Step 40: Processing report ===")
-                                            if step40_process_report():
-                                                # ADD STEPS 41-53 HERE
-                                                print("\n=== Step 41: Opening WhatsApp Web ===")
-                                                if step41_open_whatsapp_web():
-                                                    print("\n=== Step 42: Checking database key ===")
-                                                    if step42_check_database_key():
-                                                        print("\n=== Step 43: Fetching Xpath001 ===")
-                                                        if step43_fetch_xpath001():
-                                                            print("\n=== Step 44: Finding and clicking Xpath001 ===")
-                                                            if step44_find_and_click_xpath001():
-                                                                print("\n=== Step 45: Checking report number file ===")
-                                                                if step45_check_report_number_file():
-                                                                    print("\n=== Step 46: Verifying report number ===")
-                                                                    if step46_verify_report_number():
-                                                                        print("\n=== Step 47: Pasting report number ===")
-                                                                        if step47_paste_report_number():
-                                                                            print("\n=== Step 48: Waiting and pressing down ===")
-                                                                            if step48_wait_and_press_down():
-                                                                                print("\n=== Step 49: Fetching Xpath002 ===")
-                                                                                if step49_fetch_xpath002():
-                                                                                    print("\n=== Step 50: Finding and clicking Xpath002 ===")
-                                                                                    if step50_find_and_click_xpath002():
-                                                                                        print("\n=== Step 51: Transferring report content ===")
-                                                                                        if step51_transfer_report_content():
-                                                                                            print("\n=== Step 52: Waiting and pressing enter ===")
-                                                                                            if step52_wait_and_press_enter():
-                                                                                                print("\n=== Step 53: Checking message status ===")
-                                                                                                if step53_check_message_status():
-                                                                                                    # ADD STEPS 54-61 HERE
-                                                                                                    print("\n=== Step 54: Opening WhatsApp Web ===")
-                                                                                                    if step54_open_whatsapp_web():
-                                                                                                        print("\n=== Step 55: Checking database key ===")
-                                                                                                        if step55_check_database_key():
-                                                                                                            print("\n=== Step 56: Fetching Xpath001 ===")
-                                                                                                            if step56_fetch_xpath001():
-                                                                                                                print("\n=== Step 57: Finding and clicking Xpath001 ===")
-                                                                                                                if step57_find_and_click_xpath001():
-                                                                                                                    print("\n=== Step 58: Checking report number file ===")
-                                                                                                                    if step58_check_report_number_file():
-                                                                                                                        print("\n=== Step 59: Verifying report number ===")
-                                                                                                                        if step59_verify_report_number():
-                                                                                                                            print("\n=== Step 60: Pasting report number ===")
-                                                                                                                            if step60_paste_report_number():
-                                                                                                                                print("\n=== Step 61: Waiting and pressing down ===")
-                                                                                                                                if step61_wait_and_press_down():
-                                                                                                                                    # Continue with step52
-                                                                                                                                    print("Continue with step52")
-                                                                                                                                    step35_all_wishes_sent()
-                                elif next_step == "step20":
-                                    skip_to_step31 = False
-                                    selected_wish_stored = None
-                                    continue
-                    elif next_step_after_32 == "step33":
-                        print("\n=== Step 33: Redoing steps 16 to 22 ===")
-                        result = step33_redo_steps_16_to_22()
-                        
-                        if result == "step34":
-                            print("\n=== Step 34: Waiting and pressing down ===")
-                            if step34_wait_and_press_down():
-                                # Set flag to go back to step31
-                                skip_to_step31 = True
-                                continue
-                        else:
-                            # If any step fails, restart the process
-                            print("Error in step33, restarting process...")
-                            close_chrome()
-                            time.sleep(5)
-                            continue
-                
-                skip_to_step31 = False  # Reset the flag
-                selected_wish_stored = None
-                continue
-            
-            # First part: Steps 1-19 (only run once)
-            if extracted_phone_number is None:
-                # Step 1: Close Chrome if open
-                print("\n=== Step 1: Checking for and closing open Chrome browsers ===")
-                close_chrome()
-                
-                # Step 2: Check internet connection (retries forever)
-                print("\n=== Step 2: Checking internet connection ===")
-                wait_for_internet()
-                    
-                # Step 3: Check spreadsheet access key (exits if missing)
-                print("\n=== Step 3: Checking for the spreadsheet access key ===")
-                if not check_file_exists(SPREADSHEET_KEY):
-                    print("Spread sheet access key is not available")
-                    print("Closing browser and script.")
-                    exit()
-                else:
-                    print("Spread sheet access key is available")
-                    
-                    # Step 5: Access Google Spreadsheet (retries forever)
-                    print("\n=== Step 5: Accessing Google Spreadsheet ===")
-                    spreadsheet = initialize_spreadsheet()
-                    print("Reached the spread sheet")
-                    
-                    # Step 7: Remove duplicates (retries forever)
-                    print("\n=== Step 7: Removing duplicate rows ===")
-                    step7_remove_duplicates(spreadsheet)
-                    
-                    # Step 8: Filter birthdays (retries forever)
-                    print("\n=== Step 8: Filtering today's birthdays ===")
-                    step8_output = step8_filter_birthdays(spreadsheet)
-                    
-                    if next_step == "step9a":
-                        print("\n=== Step 9a: Opening WhatsApp Web ===")
-                        if step9a_open_whatsapp_web():
-                            print("\n=== Step 9b: Checking database key ===")
-                            if step9b_check_database_key():
-                                print("\n=== Step 9c: Fetching Xpath001 ===")
-                                if step9c_fetch_xpath():
-                                    print("\n=== Step 9d: Finding and clicking Xpath001 ===")
-                                    if step9d_find_and_click_xpath():
-                                        print("\n=== Step 9e: Checking report number file ===")
-                                        if step9e_check_report_number_file():
-                                            print("\n=== Step 9f: Verifying report number ===")
-                                            if step9f_verify_report_number():
-                                                print("\n=== Step 9g: Pasting report number ===")
-                                                if step9g_paste_report_number():
-                                                    print("\n=== Step 9h: Waiting and pressing down ===")
-                                                    if step9h_wait_and_press_down():
-                                                        print("\n=== Step 9i: Fetching Xpath002 ===")
-                                                        if step9i_fetch_xpath002():
-                                                            print("\n=== Step 9j: Finding and clicking Xpath002 ===")
-                                                            if step9j_find_and_click_xpath002():
-                                                                print("\n=== Step 9k: Typing admin message ===")
-                                                                if step9k_type_message():
-                                                                    print("\n=== Step 9l: Waiting and pressing enter ===")
-                                                                    if step9l_wait_and_press_enter():
-                                                                        print("\n=== Step 9m: Checking message status ===")
-                                                                        if step9m_check_message_status():
-                                                                            # Message sent successfully, exit
-                                                                            exit()
-                    
-                    elif next_step == "step10":
-                        print("\n=== Step 10: Checking and deleting contact file ===")
-                        if step10_check_and_delete_contact_file():
-                            print("\n=== Step 11: Creating new contact file ===")
-                            if step11_create_contact_file():
-                                print("\n=== Step 12: Transferring birthday data ===")
-                                if step12_transfer_birthday_data(spreadsheet):
-                                    
-                                    # Step 13: Check and delete Wishes file
-                                    print("\n=== Step 13: Checking Wishes file ===")
-                                    next_step_after_13 = step13_check_and_delete_wishes_file()
-                                    
-                                    if next_step_after_13 == "step14":
-                                        print("\n=== Step 14: Creating new Wishes file ===")
-                                        if step14_create_wishes_file():
-                                            print("\n=== Step 15: Processing wishes from sheets ===")
-                                            if step15_process_wishes_from_sheets(spreadsheet):
-                                                print("\n=== Step 16: Opening WhatsApp Web ===")
-                                                if step16_open_whatsapp_web():
-                                                    print("\n=== Step 17: Checking database key ===")
-                                                    if step17_check_database_key():
-                                                        print("\n=== Step 18: Fetching Xpath001 ===")
-                                                        if step18_fetch_xpath001():
-                                                            print("\n=== Step 19: Finding and clicking Xpath001 ===")
-                                                            if step19_find_and_click_xpath001():
-                                                                # Continue to step20 below
-                                                                pass
-                                    else:  # step15
-                                        print("\n=== Step 15: Processing wishes from sheets ===")
-                                        if step15_process_wishes_from_sheets(spreadsheet):
-                                            print("\n=== Step 16: Opening WhatsApp Web ===")
-                                            if step16_open_whatsapp_web():
-                                                print("\n=== Step 17: Checking database key ===")
-                                                if step17_check_database_key():
-                                                    print("\n=== Step 18: Fetching Xpath001 ===")
-                                                    if step18_fetch_xpath001():
-                                                        print("\n=== Step 19: Finding and clicking Xpath001 ===")
-                                                        if step19_find_and_click_xpath001():
-                                                            # Continue to step20 below
-                                                            pass
-            
-            # Step 20: Checking contact file
-            print("\n=== Step 20: Checking contact file ===")
-            if step20_check_contact_file():
-                print("\n=== Step 21: Processing contact file ===")
-                result, phone_number = step21_process_contact_file()
-                
-                if result == "step35":
-                    # ADD STEP 35 HERE
-                    print("\n=== Step 35: Transferring data to Google Sheets ===")
-                    worksheet = step35_transfer_to_sheets()
-                    
-                    # ADD STEP 38 HERE
-                    print("\n=== Step 38: Processing contact data ===")
-                    if step38_process_contact_data(worksheet):
-                        # ADD STEP 39 HERE
-                        print("\n=== Step 39: Checking WhatsApp report file ===")
-                        if step39_check_whatsapp_report():
-                            # ADD STEP 40 HERE
-                            print("\n=== Step 40: Processing report ===")
-                            if step40_process_report():
-                                # ADD STEPS 41-53 HERE
-                                print("\n=== Step 41: Opening WhatsApp Web ===")
-                                if step41_open_whatsapp_web():
-                                    print("\n=== Step 42: Checking database key ===")
-                                    if step42_check_database_key():
-                                        print("\n=== Step 43: Fetching Xpath001 ===")
-                                        if step43_fetch_xpath001():
-                                            print("\n=== Step 44: Finding and clicking Xpath001 ===")
-                                            if step44_find_and_click_xpath001():
-                                                print("\n=== Step 45: Checking report number file ===")
-                                                if step45_check_report_number_file():
-                                                    print("\n=== Step 46: Verifying report number ===")
-                                                    if step46_verify_report_number():
-                                                        print("\n=== Step 47: Pasting report number ===")
-                                                        if step47_paste_report_number():
-                                                            print("\n=== Step 48: Waiting and pressing down ===")
-                                                            if step48_wait_and_press_down():
-                                                                print("\n=== Step 49: Fetching Xpath002 ===")
-                                                                if step49_fetch_xpath002():
-                                                                    print("\n=== Step 50: Finding and clicking Xpath002 ===")
-                                                                    if step50_find_and_click_xpath002():
-                                                                        print("\n=== Step 51: Transferring report content ===")
-                                                                        if step51_transfer_report_content():
-                                                                            print("\n=== Step 52: Waiting and pressing enter ===")
-                                                                            if step52_wait_and_press_enter():
-                                                                                print("\n=== Step 53: Checking message status ===")
-                                                                                if step53_check_message_status():
-                                                                                    # ADD STEPS 54-61 HERE
-                                                                                    print("\n=== Step 54: Opening WhatsApp Web ===")
-                                                                                    if step54_open_whatsapp_web():
-                                                                                        print("\n=== Step 55: Checking database key ===")
-                                                                                        if step55_check_database_key():
-                                                                                            print("\n=== Step 56: Fetching Xpath001 ===")
-                                                                                            if step56_fetch_xpath001():
-                                                                                                print("\n=== Step 57: Finding and clicking Xpath001 ===")
-                                                                                                if step57_find_and_click_xpath001():
-                                                                                                    print("\n=== Step 58: Checking report number file ===")
-                                                                                                    if step58_check_report_number_file():
-                                                                                                        print("\n=== Step 59: Verifying report number ===")
-                                                                                                        if step59_verify_report_number():
-                                                                                                            print("\n=== Step 60: Pasting report number ===")
-                                                                                                            if step60_paste_report_number():
-                                                                                                                print("\n=== Step 61: Waiting and pressing down ===")
-                                                                                                                if step61_wait_and_press_down():
-                                                                                                                    # Continue with step52
-                                                                                                                    print("Continue with step52")
-                                                                                                                    step35_all_wishes_sent()
-                elif result:
-                    # Store the phone number for later use
-                    extracted_phone_number = phone_number
-                    print("\n=== Step 22: Waiting and checking internet ===")
-                    if step22_wait_and_check_internet():
-                        print("\n=== Step 23: Fetching Xpath004 ===")
-                        if step23_fetch_xpath004():
-                            print("\n=== Step 24: Searching for Xpath004 ===")
-                            result, timestamp = step24_search_xpath004()
-                            
-                            if result == "step24a":
-                                print("\n=== Step 24a: Closing browser ===")
-                                if step24a_close_browser():
-                                    print("\n=== Step 24b: Checking contact file ===")
-                                    if step24b_check_contact_file():
-                                        print("\n=== Step 24c: Updating contact file ===")
-                                        if step24c_update_contact_file(extracted_phone_number, timestamp):
-                                            print("\n=== Returning to step20 ===")
-                                            # Instead of restarting, continue with step20
-                                            continue  # This will continue with the next iteration of the loop
-                            
-                            elif result == "step25":
-                                print("\n=== Step 25: Waiting and pressing down ===")
-                                if step25_wait_and_press_down():
-                                    print("\n=== Step 26: Fetching Xpath002 ===")
-                                    if step26_fetch_xpath002():
-                                        print("\n=== Step 27: Finding and clicking Xpath002 ===")
-                                        result = step27_find_and_click_xpath002()
-                                        
-                                        if result is False:
-                                            # Xpath002 not found within 120 seconds, continue with step16
-                                            print("Xpath002 not found, continuing with step16...")
-                                            if step16_open_whatsapp_web():
-                                                if step17_check_database_key():
-                                                    if step18_fetch_xpath001():
-                                                        if step19_find_and_click_xpath001():
-                                                            continue  # Return to step20
-                                        elif result:
-                                            print("\n=== Step 28: Checking wishes file ===")
-                                            wishes = step28_check_wishes_file()
-                                            
-                                            if wishes:
-                                                print("\n=== Step 29: Typing random wish ===")
-                                                result, selected_wish = step29_type_random_wish(wishes)
-                                                
-                                                if result:
-                                                    print("\n=== Step 30: Waiting and pressing enter ===")
-                                                    if step30_wait_and_press_enter():
-                                                        # Set flag to go to step31 in next iteration
-                                                        skip_to_step31 = True
-                                                        selected_wish_stored = selected_wish
-                                                        continue
+            run_step_graph(resume_node())
             
         except KeyboardInterrupt:
             print("\nScript interrupted by user")
             close_chrome()
+            print_step_timings()
             exit()
+        except SystemExit:
+            print_step_timings()
+            raise
         except Exception as e:
             print(f"\nUnexpected error in main loop: {str(e)}")
             print("Restarting the process...")